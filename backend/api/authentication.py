@@ -0,0 +1,48 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+TOKEN_CACHE = 'shared'
+TOKEN_CACHE_KEY = 'auth_token:{}'
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def forget_tokens(keys):
+    keys = list(keys)
+    transaction.on_commit(lambda: caches[TOKEN_CACHE].delete_many(
+        [get_token_cache_key(key) for key in keys]
+    ))
+
+
+def forget_user_tokens(user_id):
+    forget_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    use_cache = False
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+        cache_key = get_token_cache_key(key)
+        token = caches[TOKEN_CACHE].get(cache_key)
+        if token is None:
+            token = super().authenticate_credentials(key)[1]
+            caches[TOKEN_CACHE].set(
+                cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+        return token.user, token
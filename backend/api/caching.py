@@ -0,0 +1,33 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
+from recipes.versions import (
+    AUTHOR_RECIPES_VERSION, RECIPES_VERSION, TAG_RECIPES_VERSION,
+    get_versions
+)
+
+RECIPE_LIST_CACHE_KEY = 'recipe_list:{}'
+RECIPE_LIST_PARAMS = (
+    'author', 'tags', 'page', 'limit', 'cursor', 'is_favorited',
+    'is_in_shopping_cart', 'search'
+)
+
+
+def get_recipe_list_cache_key(request):
+    params = request.query_params
+    author = params.get('author')
+    tags = sorted(set(params.getlist('tags')))
+    names = ['tags', 'ingredients']
+    if author:
+        names.append(AUTHOR_RECIPES_VERSION.format(author))
+    names.extend(TAG_RECIPES_VERSION.format(tag) for tag in tags)
+    if not author and not tags:
+        names.append(RECIPES_VERSION)
+    normalized = urlencode(sorted(
+        (name, value)
+        for name in RECIPE_LIST_PARAMS
+        for value in set(params.getlist(name))
+    ))
+    return RECIPE_LIST_CACHE_KEY.format(md5('|'.join((
+        request.get_host(), normalized, *get_versions(names)
+    )).encode()).hexdigest())
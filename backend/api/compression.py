@@ -0,0 +1,85 @@
+import gzip
+from hashlib import md5
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+COMPRESSED_CACHE_KEY = 'compressed:{}'
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain')
+ENCODINGS = ('br', 'gzip')
+COMPRESSORS = {
+    'br': lambda content, cached: brotli.compress(
+        content, quality=11 if cached else 5
+    ),
+    'gzip': lambda content, cached: gzip.compress(
+        content, compresslevel=9 if cached else 6, mtime=0
+    ),
+}
+
+
+def get_encoding(accept_encoding):
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    default = qualities.get('*', 0.0)
+    encoding = max(
+        ENCODINGS, key=lambda coding: qualities.get(coding, default)
+    )
+    if qualities.get(encoding, default) <= 0:
+        return None
+    return encoding
+
+
+def get_compressed_cache_key(request, response, encoding):
+    return COMPRESSED_CACHE_KEY.format(md5('|'.join((
+        response['ETag'], request.get_host(), response['Content-Type'],
+        encoding
+    )).encode()).hexdigest())
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = get_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        etag = response.get('ETag')
+        if etag is None:
+            content = COMPRESSORS[encoding](response.content, False)
+        else:
+            key = get_compressed_cache_key(request, response, encoding)
+            content = cache.get(key)
+            if content is None:
+                content = COMPRESSORS[encoding](response.content, True)
+                cache.set(key, content, settings.COMPRESSION_CACHE_TIMEOUT)
+        if len(content) >= len(response.content):
+            return response
+        if etag is not None and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -1,7 +1,8 @@
 import django_filters
-from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models import Exists, OuterRef
 
-from recipes.models import Recipe, Tag
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from recipes.search import search_recipes
 
 BOOLEAN_CHOICES = (
     ('0', False),
@@ -9,20 +10,6 @@ BOOLEAN_CHOICES = (
 )
 
 
-class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(method='filter_name')
-
-    def filter_name(self, ingredients, name, value):
-        return ingredients.filter(name__icontains=value.lower()).annotate(
-            sort_by=Case(
-                When(Q(name__startswith=value.lower()), then=Value(1)),
-                When(Q(name__icontains=value.lower()), then=Value(2)),
-                default=Value(3),
-                output_field=IntegerField(),
-            )
-        ).order_by('sort_by', 'name')
-
-
 class RecipeFilter(django_filters.FilterSet):
     author = django_filters.CharFilter(field_name='author__id')
     tags = django_filters.ModelMultipleChoiceFilter(
@@ -35,31 +22,26 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = django_filters.ChoiceFilter(
         method='filter_shopping_cart', choices=BOOLEAN_CHOICES
     )
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ['author', 'tags']
 
-    def filter_favorite(self, recipes, name, value):
+    def filter_user_recipes(self, recipes, value, model):
         user = self.request.user
         if user.is_anonymous:
             return recipes
-        if value == '1':
-            return recipes.filter(
-                id__in=(user.favorites.values_list('recipe', flat=True))
-            )
-        return recipes.exclude(
-            id__in=(user.favorites.values_list('recipe', flat=True))
-        )
+        exists = Exists(model.objects.filter(
+            user=user, recipe_id=OuterRef('pk')
+        ))
+        return recipes.filter(exists if value == '1' else ~exists)
+
+    def filter_favorite(self, recipes, name, value):
+        return self.filter_user_recipes(recipes, value, Favorite)
 
     def filter_shopping_cart(self, recipes, name, value):
-        user = self.request.user
-        if user.is_anonymous:
-            return recipes
-        if value == '1':
-            return recipes.filter(
-                id__in=(user.shoppingcarts.values_list('recipe', flat=True))
-            )
-        return recipes.exclude(
-            id__in=(user.shoppingcarts.values_list('recipe', flat=True))
-        )
+        return self.filter_user_recipes(recipes, value, ShoppingCart)
+
+    def filter_search(self, recipes, name, value):
+        return search_recipes(recipes, value)
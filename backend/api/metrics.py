@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import monotonic, perf_counter
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+FLUSH_INTERVAL = 1.0
+UNRESOLVED_ENDPOINT = 'unresolved'
+METRICS = {
+    'foodgram_requests_total': (
+        'counter', 'Обработанные запросы'
+    ),
+    'foodgram_request_duration_seconds': (
+        'histogram', 'Полное время обработки запроса'
+    ),
+    'foodgram_sql_queries_total': (
+        'counter', 'Выполненные SQL-запросы'
+    ),
+    'foodgram_sql_duration_seconds_total': (
+        'counter', 'Время выполнения SQL-запросов'
+    ),
+    'foodgram_serializer_duration_seconds_total': (
+        'counter', 'Время работы сериализаторов'
+    ),
+    'foodgram_response_bytes_total': (
+        'counter', 'Размер тел ответов'
+    ),
+}
+
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+def get_series_order(item):
+    (name, labels), _ = item
+    return (
+        name,
+        tuple(label for label in labels if label[0] != 'le'),
+        float(dict(labels).get('le', 0))
+    )
+
+
+class Registry:
+    def __init__(self):
+        self.lock = Lock()
+        self.series = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        self.series[key] = self.series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        index = bisect_left(LATENCY_BUCKETS, value)
+        for bucket in LATENCY_BUCKETS[index:]:
+            self.inc(f'{name}_bucket', {**labels, 'le': str(bucket)})
+        self.inc(f'{name}_bucket', {**labels, 'le': '+Inf'})
+        self.inc(f'{name}_sum', labels, value)
+        self.inc(f'{name}_count', labels)
+
+    def record(self, request_metrics, status, size, duration):
+        labels = {'endpoint': request_metrics.endpoint}
+        with self.lock:
+            self.inc(
+                'foodgram_requests_total', {**labels, 'status': str(status)}
+            )
+            self.observe('foodgram_request_duration_seconds', labels, duration)
+            self.inc(
+                'foodgram_sql_queries_total', labels, request_metrics.queries
+            )
+            self.inc(
+                'foodgram_sql_duration_seconds_total', labels,
+                request_metrics.sql_time
+            )
+            self.inc(
+                'foodgram_serializer_duration_seconds_total', labels,
+                request_metrics.serializer_time
+            )
+            self.inc('foodgram_response_bytes_total', labels, size)
+        if settings.METRICS_DIR and (
+            monotonic() - self.flushed_at > FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [name, list(labels), value]
+                for (name, labels), value in self.series.items()
+            ]
+
+    def flush(self):
+        self.flushed_at = monotonic()
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(
+            'w', dir=directory, suffix='.tmp', delete=False
+        ) as file:
+            json.dump(self.snapshot(), file)
+        os.replace(file.name, directory / f'{os.getpid()}.json')
+
+    def collect(self):
+        if not settings.METRICS_DIR:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in Path(settings.METRICS_DIR).glob('*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        series = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot:
+                key = (name, tuple(tuple(label) for label in labels))
+                series[key] = series.get(key, 0) + value
+        return series
+
+    def render(self):
+        series = self.collect()
+        lines = []
+        for metric, (metric_type, description) in METRICS.items():
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {metric_type}')
+            for (name, labels), value in sorted(
+                series.items(), key=get_series_order
+            ):
+                if name != metric and name.rpartition('_')[0] != metric:
+                    continue
+                label_text = ','.join(
+                    f'{key}="{value}"' for key, value in labels
+                )
+                lines.append(f'{name}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.endpoint = UNRESOLVED_ENDPOINT
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+def record_query(execute, sql, params, many, context):
+    request_metrics = current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.sql_time += perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_endpoint(view_func):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    return view_class.__name__
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request_metrics, response, start)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request_metrics, response, start)
+        return response
+
+    @staticmethod
+    def record(request_metrics, response, start):
+        registry.record(
+            request_metrics, response.status_code,
+            0 if response.streaming else len(response.content),
+            perf_counter() - start
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        endpoint = get_endpoint(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions and request.method.lower() in actions:
+            endpoint = f'{endpoint}.{actions[request.method.lower()]}'
+        current_request.get().endpoint = endpoint
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        request_metrics = current_request.get()
+        if request_metrics is None or request_metrics.serializer_depth:
+            return super().to_representation(instance)
+        request_metrics.serializer_depth += 1
+        start = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request_metrics.serializer_time += perf_counter() - start
+            request_metrics.serializer_depth -= 1
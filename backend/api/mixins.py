@@ -0,0 +1,40 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, quote_etag
+
+from recipes.versions import get_version
+
+
+def make_etag(*parts):
+    return quote_etag(md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest())
+
+
+class ConditionalGetMixin:
+    version_names = ()
+
+    def get_etag(self, request):
+        return make_etag(
+            *(get_version(name) for name in self.version_names),
+            request.get_full_path()
+        )
+
+    def respond_conditionally(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.respond_conditionally(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.respond_conditionally(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,84 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+INVALID_CURSOR_ERROR = 'Неверный курсор'
+
+
+class PageNumberLimitPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    invalid_cursor_message = INVALID_CURSOR_ERROR
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor[0]
+        ordering = ('pub_time', 'id') if reverse else ('-pub_time', '-id')
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(*self.cursor))
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    @staticmethod
+    def get_position_filter(reverse, pub_time, pk):
+        lookup = 'gt' if reverse else 'lt'
+        return (
+            Q(**{f'pub_time__{lookup}': pub_time})
+            | Q(pub_time=pub_time, **{f'id__{lookup}': pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            reverse, pub_time, pk = json.loads(
+                urlsafe_b64decode(encoded.encode())
+            )
+            pub_time = parse_datetime(pub_time)
+            if pub_time is None:
+                raise ValueError
+            return bool(reverse), pub_time, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, recipe):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            urlsafe_b64encode(json.dumps(
+                [reverse, recipe.pub_time.isoformat(), recipe.pk]
+            ).encode()).decode()
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework import permissions
 
+METRICS_TOKEN_PREFIX = 'Bearer '
+
 
 class AuthorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -7,3 +11,13 @@ class AuthorOrReadOnly(permissions.BasePermission):
             request.method in permissions.SAFE_METHODS
             or obj.author == request.user
         )
+
+
+class MetricsPermission(permissions.BasePermission):
+    def has_permission(self, request, view):
+        header = request.headers.get('Authorization', '')
+        if settings.METRICS_TOKEN and header.startswith(METRICS_TOKEN_PREFIX):
+            return constant_time_compare(
+                header[len(METRICS_TOKEN_PREFIX):], settings.METRICS_TOKEN
+            )
+        return request.user.is_staff
@@ -0,0 +1,70 @@
+import asyncio
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from recipes.replicas import replica_configured, replica_reads
+
+PIN_CACHE = 'shared'
+PIN_COOKIE = 'primary_pin'
+PIN_CACHE_KEY = 'primary_pin:{}'
+
+
+def get_pin_cache_key(request):
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if not header:
+        return None
+    return PIN_CACHE_KEY.format(sha256(header.encode()).hexdigest())
+
+
+def reads_from_replica(request):
+    if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return False
+    key = get_pin_cache_key(request)
+    return key is None or caches[PIN_CACHE].get(key) is None
+
+
+def pin_to_primary(request, response):
+    if request.method in SAFE_METHODS or response.status_code >= 400:
+        return response
+    key = get_pin_cache_key(request)
+    if key is not None:
+        caches[PIN_CACHE].set(key, True, settings.REPLICA_PIN_SECONDS)
+    response.set_cookie(
+        PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+        httponly=True, samesite='Lax'
+    )
+    return response
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = replica_reads.set(reads_from_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads.set(reads_from_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return pin_to_primary(request, response)
@@ -0,0 +1,71 @@
+import threading
+from bisect import bisect_left
+from itertools import chain, islice
+
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+VERSION_NAME = 'ingredients'
+NGRAM_SIZE = 3
+MAX_CHAR = '\U0010ffff'
+
+
+def get_ngrams(key):
+    return {
+        key[index:index + NGRAM_SIZE]
+        for index in range(len(key) - NGRAM_SIZE + 1)
+    }
+
+
+class IngredientSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = (None, [], [], {})
+
+    def _build(self, version):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.pk)
+        )
+        keys = [ingredient.name.casefold() for ingredient in ingredients]
+        ngrams = {}
+        for position, key in enumerate(keys):
+            for ngram in get_ngrams(key):
+                ngrams.setdefault(ngram, set()).add(position)
+        return version, keys, ingredients, ngrams
+
+    def _get_snapshot(self):
+        version = get_version(VERSION_NAME)
+        snapshot = self._snapshot
+        if snapshot[0] != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot[0] != version:
+                    snapshot = self._snapshot = self._build(version)
+        return snapshot
+
+    def search(self, value, limit=None):
+        _, keys, ingredients, ngrams = self._get_snapshot()
+        value = value.casefold()
+        start = bisect_left(keys, value)
+        end = bisect_left(keys, value + MAX_CHAR, start)
+        if limit is not None and end - start >= limit:
+            return ingredients[start:start + limit]
+        if len(value) >= NGRAM_SIZE:
+            candidates = set.intersection(*(
+                ngrams.get(ngram, set()) for ngram in get_ngrams(value)
+            ))
+        else:
+            candidates = range(len(keys))
+        contained = sorted(
+            position for position in candidates
+            if not start <= position < end and value in keys[position]
+        )
+        return [
+            ingredients[position] for position in islice(
+                chain(range(start, end), contained), limit
+            )
+        ]
+
+
+ingredient_search_index = IngredientSearchIndex()
@@ -1,32 +1,59 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 
+from .metrics import TimedSerializerMixin
+
 EMPTY_FIELD_ERROR = 'Поле имеет пустое значение'
+MAX_RECIPES_IN_BATCH = 100
 DUPLICATE_ID_ERROR = ' - повторяющиеся значения id.'
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+RECIPE_INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+AUTHOR_FIELDS = UserSerializer.Meta.fields
+IMAGE_VARIANTS = ('image_webp', 'thumbnail', 'thumbnail_webp')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = '__all__'
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = '__all__'
 
 
-class SimpleRecipeSerializer(serializers.ModelSerializer):
+class ImageVariantField(serializers.ImageField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        super().__init__(read_only=True, **kwargs)
+
+    def get_attribute(self, recipe):
+        return recipe.get_image_variant(self.variant)
+
+
+class SimpleRecipeSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    thumbnail = ImageVariantField('thumbnail')
+    thumbnail_webp = ImageVariantField('thumbnail_webp')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = (
+            'id', 'name', 'image', 'thumbnail', 'thumbnail_webp',
+            'cooking_time'
+        )
 
 
-class UserWithSubscriptionSerializer(UserSerializer):
+class UserWithSubscriptionSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.BooleanField(read_only=True, default=False)
 
     class Meta(UserSerializer.Meta):
@@ -35,7 +62,7 @@ class UserWithSubscriptionSerializer(UserSerializer):
 
 class SubscribeSerializer(UserWithSubscriptionSerializer):
     recipes = SimpleRecipeSerializer(many=True)
-    recipes_count = serializers.IntegerField(source='recipes.count')
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserWithSubscriptionSerializer.Meta):
         fields = (
@@ -43,12 +70,31 @@ class SubscribeSerializer(UserWithSubscriptionSerializer):
             'recipes_count'
         )
 
-    def to_representation(self, user):
-        representation = super().to_representation(user)
-        representation['recipes'] = (
-            representation['recipes'][:self.context['recipes_limit']]
-        )
-        return representation
+
+class BatchPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def get_objects(self, pks):
+        return self.get_queryset().in_bulk(set(pks))
+
+    def get_missing_error(self, pk):
+        return self.error_messages['does_not_exist'].format(pk_value=pk)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=MAX_RECIPES_IN_BATCH
+    )
+
+    def validate_recipes(self, recipe_ids):
+        return list(dict.fromkeys(recipe_ids))
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -66,7 +112,18 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
+    id = BatchPrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all(), source='ingredient'
+    )
+    amount = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'amount')
+
+
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True, default=False)
     is_in_shopping_cart = serializers.BooleanField(
         read_only=True, default=False
@@ -77,19 +134,96 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         many=True, source='ingredients_in_recipes'
     )
     author = UserWithSubscriptionSerializer(read_only=True)
+    image_webp = ImageVariantField('image_webp')
+    thumbnail = ImageVariantField('thumbnail')
+    thumbnail_webp = ImageVariantField('thumbnail_webp')
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_webp',
+            'thumbnail', 'thumbnail_webp', 'text', 'cooking_time'
         )
 
 
-class RecipeWriteSerializer(serializers.ModelSerializer):
+class RecipeRowsListSerializer(
+    TimedSerializerMixin, serializers.ListSerializer
+):
+    def to_representation(self, recipes):
+        recipes = list(recipes)
+        self.child.load_relations(recipes)
+        return [self.child.to_representation(recipe) for recipe in recipes]
+
+
+class FastRecipeReadSerializer(
+    TimedSerializerMixin, serializers.BaseSerializer
+):
+    class Meta:
+        list_serializer_class = RecipeRowsListSerializer
+
+    def load_relations(self, recipes):
+        recipe_ids = [recipe.pk for recipe in recipes]
+        self.loaded_ids = set(recipe_ids)
+        self.tags = defaultdict(list)
+        for recipe_id, *tag in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__name').values_list(
+            'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+        ):
+            self.tags[recipe_id].append(dict(zip(TAG_FIELDS, tag)))
+        self.ingredients = defaultdict(list)
+        for recipe_id, *ingredient in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            self.ingredients[recipe_id].append(
+                dict(zip(RECIPE_INGREDIENT_FIELDS, ingredient))
+            )
+
+    def get_image_url(self, image):
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
+    def to_representation(self, recipe):
+        if recipe.pk not in getattr(self, 'loaded_ids', ()):
+            self.load_relations([recipe])
+        author = recipe.author
+        return {
+            'id': recipe.pk,
+            'tags': self.tags[recipe.pk],
+            'author': {
+                **{field: getattr(author, field) for field in AUTHOR_FIELDS},
+                'is_subscribed': getattr(author, 'is_subscribed', False),
+            },
+            'ingredients': self.ingredients[recipe.pk],
+            'is_favorited': getattr(recipe, 'is_favorited', False),
+            'is_in_shopping_cart': getattr(
+                recipe, 'is_in_shopping_cart', False
+            ),
+            'name': recipe.name,
+            'image': self.get_image_url(recipe.image),
+            **{
+                variant: self.get_image_url(
+                    recipe.get_image_variant(variant)
+                )
+                for variant in IMAGE_VARIANTS
+            },
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+
+class RecipeWriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image = Base64ImageField(required=True)
-    ingredients = RecipeIngredientSerializer(many=True, required=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    ingredients = RecipeIngredientWriteSerializer(many=True, required=True)
+    tags = BatchPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True, required=True
     )
 
@@ -100,33 +234,47 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
 
     @staticmethod
-    def validate_tags_ingredients(values, model):
-        if len(values) < 1:
-            raise serializers.ValidationError([EMPTY_FIELD_ERROR])
+    def validate_duplicates(ids, objects):
         duplicated_ids = [
-            str(item.id) for item in values if values.count(item) > 1
+            pk for pk, count in Counter(ids).items() if count > 1
         ]
         if duplicated_ids:
             error = {
                 'duplicated': [
-                    f'{ingredient.name} ({ingredient.id})'
-                    for ingredient in model.objects.filter(
-                        id__in=duplicated_ids
-                    )
+                    f'{objects[pk].name} ({pk})' for pk in duplicated_ids
                 ]
             }
             error['duplicated'].append(DUPLICATE_ID_ERROR)
             raise serializers.ValidationError([error])
-        return values
 
-    def validate_tags(self, tags):
-        return self.validate_tags_ingredients(tags, Tag)
+    def validate_tags(self, tag_ids):
+        if len(tag_ids) < 1:
+            raise serializers.ValidationError([EMPTY_FIELD_ERROR])
+        field = self.fields['tags'].child_relation
+        tags = field.get_objects(tag_ids)
+        for pk in tag_ids:
+            if pk not in tags:
+                raise serializers.ValidationError(
+                    [field.get_missing_error(pk)]
+                )
+        self.validate_duplicates(tag_ids, tags)
+        return [tags[pk] for pk in tag_ids]
 
     def validate_ingredients(self, ingredients):
-        self.validate_tags_ingredients(
-            [ingredient['ingredient'] for ingredient in ingredients],
-            Ingredient
-        )
+        if len(ingredients) < 1:
+            raise serializers.ValidationError([EMPTY_FIELD_ERROR])
+        field = self.fields['ingredients'].child.fields['id']
+        ids = [ingredient['ingredient'] for ingredient in ingredients]
+        objects = field.get_objects(ids)
+        errors = [
+            {} if pk in objects else {'id': [field.get_missing_error(pk)]}
+            for pk in ids
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        self.validate_duplicates(ids, objects)
+        for ingredient in ingredients:
+            ingredient['ingredient'] = objects[ingredient['ingredient']]
         return ingredients
 
     def validate_image(self, image):
@@ -135,7 +283,9 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return image
 
     def to_representation(self, recipe):
-        return RecipeReadSerializer(recipe).data
+        return RecipeReadSerializer(
+            Recipe.objects.for_read(recipe.author_id).get(pk=recipe.pk)
+        ).data
 
     @staticmethod
     def create_recipe_ingredients(recipe, ingredients):
@@ -145,6 +295,51 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             amount=ingredient['amount']
         ) for ingredient in ingredients)
 
+    @staticmethod
+    def update_recipe_tags(recipe, tags):
+        current_ids = set(recipe.tags.values_list('pk', flat=True))
+        new_ids = {tag.pk for tag in tags}
+        if current_ids == new_ids:
+            return False
+        if current_ids - new_ids:
+            recipe.tags.remove(*(current_ids - new_ids))
+        if new_ids - current_ids:
+            recipe.tags.add(*(new_ids - current_ids))
+        return True
+
+    def update_recipe_ingredients(self, recipe, ingredients):
+        amounts = {
+            ingredient['ingredient'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.ingredients_in_recipes.all()
+        }
+        removed_ids = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['ingredient'].pk not in existing
+        ]
+        if removed_ids:
+            RecipeIngredient.objects.filter(pk__in=removed_ids).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            self.create_recipe_ingredients(recipe, added)
+        return bool(removed_ids or changed or added)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -153,6 +348,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self.create_recipe_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         error = {}
         tags = validated_data.pop('tags', None)
@@ -163,7 +359,15 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             error['ingredients'] = [EMPTY_FIELD_ERROR]
         if error:
             raise serializers.ValidationError(error)
-        recipe.tags.set(tags)
-        recipe.ingredients.clear()
-        self.create_recipe_ingredients(recipe, ingredients)
-        return super().update(recipe, validated_data)
+        relations_changed = self.update_recipe_tags(recipe, tags)
+        if self.update_recipe_ingredients(recipe, ingredients):
+            relations_changed = True
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(recipe, field) != value
+        ]
+        for field in changed_fields:
+            setattr(recipe, field, validated_data[field])
+        if changed_fields or relations_changed:
+            recipe.save(update_fields=[*changed_fields, 'updated_at'])
+        return recipe
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Subscribe
+
+from .authentication import forget_tokens, forget_user_tokens
+from .metrics import install_query_recorder
+
+User = get_user_model()
+
+connection_created.connect(install_query_recorder)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        forget_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def forget_subscriber_tokens(sender, instance, **kwargs):
+    forget_user_tokens(instance.subscriber_id)
@@ -0,0 +1,339 @@
+import re
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from api.authentication import TOKEN_CACHE, get_token_cache_key
+from api.metrics import LATENCY_BUCKETS, Registry
+from api.renderers import FastJSONRenderer
+from api.replicas import PIN_CACHE, pin_to_primary, reads_from_replica
+from api.serializers import FastRecipeReadSerializer, RecipeReadSerializer
+from foodgram.asgi import application
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscribe,
+    Tag, User
+)
+
+IMAGE = 'recipes/images/test.png'
+ANONYMOUS_QUERIES = 4
+AUTHORIZED_QUERIES = 5
+BATCH_CHANGE_QUERIES = 7
+
+
+class RecipesDataMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='pass'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+            )
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'продукт {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10 + number, image=IMAGE
+            )
+            for number in range(8)
+        ]
+        for recipe in cls.recipes:
+            recipe.tags.set(cls.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in cls.ingredients
+            )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+
+class RecipeDetailTests(RecipesDataMixin, TestCase):
+    def test_non_numeric_pk_returns_not_found(self):
+        for headers in ({}, self.auth):
+            with self.subTest(authorized=bool(headers)):
+                response = self.client.get('/api/recipes/abc/', **headers)
+                self.assertEqual(response.status_code, 404)
+
+
+class RecipeQueryBudgetTests(RecipesDataMixin, TestCase):
+    def assert_budget(self, path):
+        for fast in (True, False):
+            for headers, queries in (
+                ({}, ANONYMOUS_QUERIES), (self.auth, AUTHORIZED_QUERIES)
+            ):
+                with self.subTest(
+                    path=path, fast=fast, authorized=bool(headers)
+                ), override_settings(FAST_RECIPE_SERIALIZER=fast):
+                    for cache in caches.all():
+                        cache.clear()
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(path, **headers)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_list(self):
+        for limit in (2, len(self.recipes)):
+            self.assert_budget(f'/api/recipes/?limit={limit}')
+
+    def test_detail(self):
+        self.assert_budget(f'/api/recipes/{self.recipes[0].pk}/')
+
+
+class FastRecipeSerializerContractTests(RecipesDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Subscribe.objects.create(subscriber=cls.user, author=cls.author)
+        recipe = cls.recipes[2]
+        recipe.text = 'Строка\u2028с разделителями\u2029и "кавычками"'
+        recipe.save()
+        recipe.tags.clear()
+        recipe.ingredients_in_recipes.all().delete()
+
+    def assert_same_json(self, expected, actual):
+        self.assertEqual(
+            FastJSONRenderer().render(actual),
+            JSONRenderer().render(expected)
+        )
+
+    def test_matches_recipe_read_serializer(self):
+        context = {'request': RequestFactory().get('/api/recipes/')}
+        for user_id in (None, self.user.pk):
+            with self.subTest(user_id=user_id):
+                expected = RecipeReadSerializer(
+                    Recipe.objects.for_read(user_id), many=True,
+                    context=context
+                ).data
+                recipes = list(
+                    Recipe.objects.for_read(user_id, prefetch=False)
+                )
+                actual = FastRecipeReadSerializer(
+                    recipes, many=True, context=context
+                ).data
+                self.assertEqual(len(actual), len(expected))
+                for expected_recipe, actual_recipe in zip(expected, actual):
+                    self.assert_same_json(expected_recipe, actual_recipe)
+                for recipe, expected_recipe in zip(recipes, expected):
+                    self.assert_same_json(
+                        expected_recipe,
+                        FastRecipeReadSerializer(
+                            recipe, context=context
+                        ).data
+                    )
+
+
+class SubscriptionRecipesLimitTests(RecipesDataMixin, TestCase):
+    def test_limits_recipes(self):
+        Subscribe.objects.create(subscriber=self.user, author=self.author)
+        for recipes_limit, count in (('', 8), ('0', 0), ('3', 3)):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}, **self.auth
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.json()['results'][0]['recipes']), count
+                )
+
+    def test_invalid_limit_returns_bad_request(self):
+        Subscribe.objects.create(subscriber=self.user, author=self.author)
+        for recipes_limit in ('-1', 'abc', '1.5'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}, **self.auth
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.json())
+
+    def test_invalid_limit_does_not_subscribe(self):
+        response = self.client.post(
+            f'/api/users/{self.author.pk}/subscribe/?recipes_limit=-1',
+            **self.auth
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscribe.objects.filter(
+            subscriber=self.user, author=self.author
+        ).exists())
+
+
+class ASGIStreamingTests(RecipesDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    @async_to_sync
+    async def fetch(self, path, query_string):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': query_string.encode(),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', self.auth['HTTP_AUTHORIZATION'].encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output()
+        body = []
+        message = {'more_body': True}
+        while message.get('more_body'):
+            message = await communicator.receive_output()
+            body.append(message.get('body', b''))
+        return start, body
+
+    def test_shopping_cart_is_streamed(self):
+        for file_format in ('txt', 'csv'):
+            with self.subTest(file_format=file_format):
+                start, body = self.fetch(
+                    '/api/recipes/download_shopping_cart/',
+                    f'format={file_format}'
+                )
+                self.assertEqual(start['status'], 200)
+                self.assertNotIn(
+                    b'content-length',
+                    (header.lower() for header, _ in start['headers'])
+                )
+                self.assertGreater(len(body), 2)
+                self.assertIn(
+                    self.recipes[1].name.encode(), b''.join(body)
+                )
+
+
+class FavoriteCountersTests(RecipesDataMixin, TestCase):
+    def assert_counters_match_rows(self):
+        for recipe in Recipe.objects.all():
+            with self.subTest(recipe=recipe.pk):
+                self.assertEqual(
+                    recipe.favorites_count,
+                    Favorite.objects.filter(recipe=recipe).count()
+                )
+
+    def test_counters_follow_added_and_removed_rows(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes[:4]]
+        self.client.post(
+            f'/api/recipes/{recipe_ids[3]}/favorite/', **self.auth
+        )
+        for method in ('post', 'post', 'delete', 'delete'):
+            response = getattr(self.client, method)(
+                '/api/recipes/favorite/', {'recipes': recipe_ids},
+                content_type='application/json', **self.auth
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assert_counters_match_rows()
+
+    def test_batch_changes_use_constant_queries(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes]
+        for change in (Favorite.add_recipes, Favorite.remove_recipes):
+            with self.subTest(change=change.__name__):
+                with self.assertNumQueries(BATCH_CHANGE_QUERIES):
+                    change(self.user, recipe_ids)
+                self.assert_counters_match_rows()
+
+
+class MetricsRenderTests(TestCase):
+    @override_settings(METRICS_DIR=None)
+    def test_histogram_buckets_are_in_numeric_order(self):
+        registry = Registry()
+        for endpoint in ('RecipeViewSet.list', 'TagViewSet.list'):
+            for value in (0.001, 0.3, 20):
+                registry.observe(
+                    'foodgram_request_duration_seconds',
+                    {'endpoint': endpoint}, value
+                )
+        buckets = {}
+        for line in registry.render().splitlines():
+            if line.startswith('foodgram_request_duration_seconds_bucket'):
+                endpoint, le = re.search(
+                    r'endpoint="([^"]+)",le="([^"]+)"', line
+                ).groups()
+                buckets.setdefault(endpoint, []).append(le)
+        expected = [*(str(bucket) for bucket in LATENCY_BUCKETS), '+Inf']
+        self.assertEqual(
+            list(buckets), ['RecipeViewSet.list', 'TagViewSet.list']
+        )
+        for endpoint, labels in buckets.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(labels, expected)
+
+
+class CachedTokenTests(RecipesDataMixin, TestCase):
+    def test_tokens_are_cached_across_processes(self):
+        self.assertNotIsInstance(caches[TOKEN_CACHE], LocMemCache)
+
+    def test_logout_forgets_cached_token(self):
+        cache_key = get_token_cache_key(self.token.key)
+        response = self.client.get('/api/users/me/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(caches[TOKEN_CACHE].get(cache_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/', **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(caches[TOKEN_CACHE].get(cache_key))
+        response = self.client.get('/api/users/me/', **self.auth)
+        self.assertEqual(response.status_code, 401)
+
+
+class AuthorChangeTests(RecipesDataMixin, TestCase):
+    def test_author_change_refreshes_tag_pages(self):
+        path = f'/api/recipes/?tags={self.tags[0].slug}'
+        response = self.client.get(path)
+        etag = response['ETag']
+        self.assertEqual(
+            response.json()['results'][0]['author']['first_name'], 'Автор'
+        )
+        self.author.first_name = 'Повар'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['author']['first_name'], 'Повар'
+        )
+
+
+class PrimaryPinTests(RecipesDataMixin, TestCase):
+    def test_token_client_is_pinned_in_shared_cache(self):
+        self.assertNotIsInstance(caches[PIN_CACHE], LocMemCache)
+        factory = RequestFactory()
+        self.assertTrue(
+            reads_from_replica(factory.get('/api/recipes/', **self.auth))
+        )
+        pin_to_primary(
+            factory.post('/api/recipes/', **self.auth), HttpResponse()
+        )
+        self.assertFalse(
+            reads_from_replica(factory.get('/api/recipes/', **self.auth))
+        )
+        self.assertTrue(reads_from_replica(factory.get('/api/recipes/')))
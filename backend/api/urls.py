@@ -1,9 +1,10 @@
 from django.conf.urls import url
-from django.urls import include
+from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
-    IngredientViewSet, RecipeViewSet, TagViewSet, UserWithSubscriptionViewSet
+    IngredientViewSet, MetricsView, RecipeViewSet, TagViewSet,
+    UserWithSubscriptionViewSet
 )
 
 router = routers.DefaultRouter()
@@ -13,6 +14,7 @@ router.register('users', UserWithSubscriptionViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('metrics', MetricsView.as_view(), name='metrics'),
     url('auth/', include('djoser.urls.authtoken')),
     url('', include(router.urls)),
 ]
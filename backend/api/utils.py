@@ -1,17 +1,135 @@
+import csv
 from datetime import datetime
+from io import BytesIO
 
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import DefaultContentNegotiation
 
-def create_shopping_cart(ingredients, recipes):
-    return '\n'.join(
-        (
-            f'{datetime.now().strftime("%d-%m-%Y %H:%M:%S")}',
-            'Необходимые продукты:', '',
-            *[
-                f'{index}. {ingredient.name.capitalize()} '
-                f'— {ingredient.total_amount} ({ingredient.measurement_unit})'
-                for index, ingredient in enumerate(ingredients, start=1)
-            ],
-            '', 'Перечень рецептов:', '',
-            *recipes
+CHUNK_SIZE = 2000
+FILENAME = 'shopping_cart.{}'
+INGREDIENTS_TITLE = 'Необходимые продукты:'
+RECIPES_TITLE = 'Перечень рецептов:'
+CSV_HEADER = ('№', 'Продукт', 'Количество', 'Единица измерения')
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_MARGIN = 50
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def get_created_at():
+    return datetime.now().strftime('%d-%m-%Y %H:%M:%S')
+
+
+def iterate_shopping_cart(ingredients, recipes):
+    return (
+        enumerate(ingredients.iterator(chunk_size=CHUNK_SIZE), start=1),
+        recipes.iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def create_shopping_cart_lines(ingredients, recipes):
+    ingredients, recipes = iterate_shopping_cart(ingredients, recipes)
+    yield get_created_at()
+    yield INGREDIENTS_TITLE
+    yield ''
+    for index, ingredient in ingredients:
+        yield (
+            f'{index}. {ingredient.name.capitalize()} '
+            f'— {ingredient.total_amount} ({ingredient.measurement_unit})'
+        )
+    yield ''
+    yield RECIPES_TITLE
+    yield ''
+    yield from recipes
+
+
+def create_shopping_cart_rows(ingredients, recipes):
+    ingredients, recipes = iterate_shopping_cart(ingredients, recipes)
+    yield CSV_HEADER
+    for index, ingredient in ingredients:
+        yield (
+            index, ingredient.name.capitalize(), ingredient.total_amount,
+            ingredient.measurement_unit
+        )
+    yield ()
+    yield (RECIPES_TITLE,)
+    for recipe in recipes:
+        yield (recipe,)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients, recipes):
+    return (
+        f'{line}\n'.encode()
+        for line in create_shopping_cart_lines(ingredients, recipes)
+    )
+
+
+def stream_csv(ingredients, recipes):
+    writer = csv.writer(Echo())
+    return (
+        writer.writerow(row).encode()
+        for row in create_shopping_cart_rows(ingredients, recipes)
+    )
+
+
+def create_pdf(ingredients, recipes):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+        )
+    buffer = BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - PDF_MARGIN
+    document.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    for line in create_shopping_cart_lines(ingredients, recipes):
+        if y < PDF_MARGIN:
+            document.showPage()
+            document.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        document.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+    document.save()
+    return buffer.getvalue()
+
+
+STREAM_FORMATS = {
+    'txt': (stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+}
+FILE_FORMATS = {
+    'pdf': (create_pdf, 'application/pdf'),
+}
+SHOPPING_CART_FORMATS = (*STREAM_FORMATS, *FILE_FORMATS)
+
+
+def export_shopping_cart(file_format, ingredients, recipes):
+    if file_format in STREAM_FORMATS:
+        stream, content_type = STREAM_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            stream(ingredients, recipes), content_type=content_type
         )
+    else:
+        create, content_type = FILE_FORMATS[file_format]
+        content = create(ingredients, recipes)
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Length'] = len(content)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME.format(file_format)}"'
     )
+    return response
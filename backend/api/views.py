@@ -1,41 +1,58 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef
-from django.http import FileResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.mixins import ListModelMixin
 from rest_framework.permissions import (
     IsAuthenticated, IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
 from recipes.models import (
     Favorite, Ingredient, Recipe, ShoppingCart, Subscribe, Tag
 )
+from recipes.versions import get_version
 
-from .filters import IngredientFilter, RecipeFilter
-from .permissions import AuthorOrReadOnly
+from .caching import get_recipe_list_cache_key
+from .filters import RecipeFilter
+from .metrics import registry
+from .mixins import ConditionalGetMixin, make_etag
+from .pagination import PageNumberLimitPagination, RecipeCursorPagination
+from .permissions import AuthorOrReadOnly, MetricsPermission
+from .renderers import PrometheusRenderer
+from .search import ingredient_search_index
 from .serializers import (
-    IngredientSerializer, RecipeReadSerializer, RecipeWriteSerializer,
-    SimpleRecipeSerializer, SubscribeSerializer, TagSerializer,
-    UserWithSubscriptionSerializer
+    FastRecipeReadSerializer, IngredientSerializer, RecipeIdsSerializer,
+    RecipeReadSerializer, RecipeWriteSerializer, SimpleRecipeSerializer,
+    SubscribeSerializer, TagSerializer, UserWithSubscriptionSerializer
+)
+from .utils import (
+    SHOPPING_CART_FORMATS, IgnoreFormatContentNegotiation,
+    export_shopping_cart
 )
-from .utils import create_shopping_cart
 
 User = get_user_model()
 
 DOUBLE_SUBSCRIBE_ERROR = 'Вы уже подписаны на {}'
 SUBSCRIBE_SELF_ERROR = 'Нельзя подписаться на самого себя'
 RECIPE_IS_ALREADY_IN_ERROR = 'Этот рецепт уже добавлен'
-
-
-class PageNumberLimitPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
+UNKNOWN_FORMAT_ERROR = 'Неизвестный формат {}, доступны: {}'
+RECIPES_LIMIT_ERROR = 'Ожидается целое неотрицательное число, получено {}'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+BATCH_CREATED = 'created'
+BATCH_EXISTS = 'exists'
+BATCH_DELETED = 'deleted'
+BATCH_ABSENT = 'absent'
+BATCH_NOT_FOUND = 'not_found'
 
 
 class UserWithSubscriptionViewSet(UserViewSet):
@@ -55,6 +72,28 @@ class UserWithSubscriptionViewSet(UserViewSet):
             )
         )
 
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if not recipes_limit:
+            return None
+        if not recipes_limit.isdecimal():
+            raise ValidationError({'recipes_limit': RECIPES_LIMIT_ERROR.format(
+                recipes_limit
+            )})
+        return int(recipes_limit)
+
+    def add_subscription_data(self, authors, recipes_limit):
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author_id=OuterRef('author_id')
+                ).values('id')[:recipes_limit]
+            ))
+        return authors.prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        )
+
     def get_permissions(self):
         if self.action == 'me':
             return (IsAuthenticated(),)
@@ -72,21 +111,25 @@ class UserWithSubscriptionViewSet(UserViewSet):
                 Subscribe, author=author, subscriber=user
             ).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
+        recipes_limit = self.get_recipes_limit()
+        if author == user:
+            raise ValidationError(
+                {'errors': SUBSCRIBE_SELF_ERROR}
+            )
         if not Subscribe.objects.get_or_create(
                 author=author, subscriber=user
         )[1]:
             raise ValidationError(
                 {'errors': DOUBLE_SUBSCRIBE_ERROR.format(author.username)}
             )
-        if author == user:
-            raise ValidationError(
-                {'errors': SUBSCRIBE_SELF_ERROR}
-            )
-        data = SubscribeSerializer(author, context={
-            'recipes_limit': int(request.GET.get('recipes_limit', 10**10))
-        }).data
-        data['is_subscribed'] = True
-        return Response(data, status.HTTP_201_CREATED)
+        return Response(
+            SubscribeSerializer(
+                self.add_subscription_data(
+                    self.get_queryset(), recipes_limit
+                ).get(pk=author.pk)
+            ).data,
+            status.HTTP_201_CREATED
+        )
 
     @action(
         detail=False, methods=['get'], url_path='subscriptions',
@@ -95,32 +138,41 @@ class UserWithSubscriptionViewSet(UserViewSet):
     def subscriptions(self, request):
         user = request.user
         return self.get_paginated_response(SubscribeSerializer(
-            self.paginate_queryset(self.get_queryset().filter(
-                id__in=user.subscribers.values_list('author', flat=True)
-            )), many=True,
-            context={
-                'recipes_limit': int(request.GET.get('recipes_limit', 10**10))
-            }
+            self.paginate_queryset(self.add_subscription_data(
+                self.get_queryset().filter(
+                    id__in=user.subscribers.values_list('author', flat=True)
+                ),
+                self.get_recipes_limit()
+            )), many=True
         ).data)
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = IngredientFilter
     pagination_class = None
     http_method_names = ['get']
+    version_names = ('ingredients',)
+
+    def filter_queryset(self, ingredients):
+        name = self.request.query_params.get('name')
+        if self.action != 'list' or not name:
+            return super().filter_queryset(ingredients)
+        limit = self.request.query_params.get('limit', '')
+        return ingredient_search_index.search(
+            name, limit=int(limit) if limit.isdigit() else None
+        )
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     http_method_names = ['get']
+    version_names = ('tags',)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = PageNumberLimitPagination
     filter_backends = [DjangoFilterBackend]
@@ -128,11 +180,69 @@ class RecipeViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = [AuthorOrReadOnly, IsAuthenticatedOrReadOnly]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = (
+                RecipeCursorPagination()
+                if 'cursor' in self.request.query_params
+                else self.pagination_class()
+            )
+        return self._paginator
+
+    def get_etag(self, request):
+        if self.action == 'list' and request.user.is_anonymous:
+            return make_etag(
+                get_recipe_list_cache_key(request), request.get_full_path()
+            )
+        if self.action != 'retrieve' or not str(self.kwargs['pk']).isdigit():
+            return None
+        flags = Recipe.objects.add_user_annotations(
+            request.user.pk
+        ).filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'is_favorited', 'is_in_shopping_cart',
+            'author__username', 'author__first_name', 'author__last_name',
+            'author__email'
+        ).first()
+        if flags is None:
+            return None
+        return make_etag(
+            *flags, get_version('tags'), get_version('ingredients'),
+            request.get_full_path()
+        )
+
     def get_queryset(self):
-        return Recipe.objects.add_user_annotations(self.request.user.pk)
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return Recipe.objects.add_user_annotations(self.request.user.pk)
+        recipes = Recipe.objects.for_read(
+            self.request.user.pk,
+            prefetch=not settings.FAST_RECIPE_SERIALIZER
+        )
+        if self.action == 'feed':
+            return recipes.feed(self.request.user)
+        return recipes
+
+    def list(self, request, *args, **kwargs):
+        if self.action != 'list' or not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        return self.respond_conditionally(
+            self.list_anonymous, request, *args, **kwargs
+        )
+
+    def list_anonymous(self, request, *args, **kwargs):
+        key = get_recipe_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = ListModelMixin.list(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+        return response
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
+            if settings.FAST_RECIPE_SERIALIZER:
+                return FastRecipeReadSerializer
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
@@ -143,10 +253,13 @@ class RecipeViewSet(ModelViewSet):
     def create_delete_for_recipe(request, model, recipe_id):
         recipe = get_object_or_404(Recipe, pk=recipe_id)
         user = request.user
-        if request.method == 'DELETE':
-            get_object_or_404(model, user=user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        if not model.objects.get_or_create(user=user, recipe=recipe)[1]:
+        with transaction.atomic():
+            model.lock_user(user)
+            if request.method == 'DELETE':
+                get_object_or_404(model, user=user, recipe=recipe).delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            created = model.objects.get_or_create(user=user, recipe=recipe)[1]
+        if not created:
             raise ValidationError(
                 {'errors': RECIPE_IS_ALREADY_IN_ERROR}
             )
@@ -154,6 +267,40 @@ class RecipeViewSet(ModelViewSet):
             SimpleRecipeSerializer(recipe).data, status=status.HTTP_201_CREATED
         )
 
+    @staticmethod
+    def create_delete_for_recipes(request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'DELETE':
+            found_ids, changed_ids = model.remove_recipes(
+                request.user, recipe_ids
+            )
+            results = (BATCH_DELETED, BATCH_ABSENT)
+        else:
+            found_ids, changed_ids = model.add_recipes(
+                request.user, recipe_ids
+            )
+            results = (BATCH_CREATED, BATCH_EXISTS)
+        return Response({'results': [
+            {
+                'id': pk,
+                'result': (
+                    BATCH_NOT_FOUND if pk not in found_ids
+                    else results[0] if pk in changed_ids
+                    else results[1]
+                )
+            }
+            for pk in recipe_ids
+        ]})
+
+    @action(
+        detail=False, methods=['get'], url_path='feed', url_name='feed',
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        return self.list(request)
+
     @action(
         detail=True, methods=['post', 'delete'], url_path='favorite',
         url_name='favorite', permission_classes=[IsAuthenticated]
@@ -168,15 +315,43 @@ class RecipeViewSet(ModelViewSet):
     def shopping_cart(self, request, pk):
         return self.create_delete_for_recipe(request, ShoppingCart, pk)
 
+    @action(
+        detail=False, methods=['post', 'delete'], url_path='favorite',
+        url_name='favorite-batch', permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return self.create_delete_for_recipes(request, Favorite)
+
+    @action(
+        detail=False, methods=['post', 'delete'], url_path='shopping_cart',
+        url_name='shoppingcart-batch', permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self.create_delete_for_recipes(request, ShoppingCart)
+
     @action(
         detail=False, methods=['get'], url_path='download_shopping_cart',
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation
     )
     def download_shopping_cart(self, request):
-        return FileResponse(
-            create_shopping_cart(
-                *ShoppingCart.get_ingredients_and_recipes(request.user)
-            ),
-            as_attachment=True, filename='shopping_cart.txt',
-            content_type='text/plain'
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
+            raise ValidationError({'format': UNKNOWN_FORMAT_ERROR.format(
+                file_format, ', '.join(SHOPPING_CART_FORMATS)
+            )})
+        return export_shopping_cart(
+            file_format,
+            *ShoppingCart.get_ingredients_and_recipes(request.user)
+        )
+
+
+class MetricsView(APIView):
+    permission_classes = [MetricsPermission]
+    renderer_classes = [PrometheusRenderer]
+    content_negotiation_class = IgnoreFormatContentNegotiation
+
+    def get(self, request):
+        return Response(
+            registry.render(), content_type=PROMETHEUS_CONTENT_TYPE
         )
@@ -9,8 +9,41 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+STREAM_END = object()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        response.streaming_content = ()
+
+        async def send_parts(message):
+            if (
+                message['type'] == 'http.response.body'
+                and not message.get('more_body')
+            ):
+                part = await next_part(parts, STREAM_END)
+                while part is not STREAM_END:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+                    part = await next_part(parts, STREAM_END)
+            await send(message)
+
+        return await super().send_response(response, send_parts)
+
+
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
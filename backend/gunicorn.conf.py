@@ -0,0 +1,10 @@
+import os
+
+SERVER_MODES = {
+    'wsgi': ('foodgram.wsgi:application', 'sync'),
+    'asgi': ('foodgram.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+wsgi_app, worker_class = SERVER_MODES[os.getenv('SERVER_MODE', 'wsgi')]
+bind = os.getenv('SERVER_BIND', '0.0.0.0:9000')
+workers = int(os.getenv('SERVER_WORKERS', 1))
@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Count
+from django.db.models import Count, Prefetch
 from django.utils.safestring import mark_safe
 
+from .facets import (
+    cached_facet, count_authors, count_cooking_times, count_tags,
+    format_range, parse_range
+)
 from .models import (
     Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscribe,
     Tag, User
@@ -35,9 +39,14 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     readonly_fields = ('in_recipes_count',)
 
-    @admin.display(description='В рецептах')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=Count('ingredients_in_recipes')
+        )
+
+    @admin.display(description='В рецептах', ordering='recipes_count')
     def in_recipes_count(self, ingredient):
-        return ingredient.ingredients_in_recipes.count()
+        return ingredient.recipes_count
 
 
 @admin.register(Tag)
@@ -56,6 +65,7 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe__author', 'ingredient')
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -63,30 +73,14 @@ class RecipeIngredientInline(admin.TabularInline):
     extra = 0
 
 
-def dynamic_queryset(request, recipes):
-    author = request.GET.get('author')
-    if author:
-        recipes = recipes.filter(author__username=author)
-    tag = request.GET.get('tag')
-    if tag:
-        recipes = recipes.filter(tags__slug=tag)
-    cooking_time = request.GET.get('cooking_time')
-    if cooking_time:
-        return recipes.filter(cooking_time__range=eval(cooking_time))
-    return recipes
-
-
 class TagFilter(admin.SimpleListFilter):
     title = 'Теги'
     parameter_name = 'tag'
 
     def lookups(self, request, model_admin):
-        recipes = dynamic_queryset(request, model_admin.get_queryset(request))
         return tuple(
-            (
-                tag.slug,
-                f'{tag.name} ({recipes.filter(tags__exact=tag).count()})'
-            ) for tag in Tag.objects.all()
+            (slug, f'{name} ({count})')
+            for slug, name, count in cached_facet('tags', request, count_tags)
         )
 
     def queryset(self, request, recipes):
@@ -99,13 +93,11 @@ class AuthorWithRecipesFilter(admin.SimpleListFilter):
     parameter_name = 'author'
 
     def lookups(self, request, model_admin):
-        recipes = dynamic_queryset(request, model_admin.get_queryset(request))
         return tuple(
-            (
-                author.username,
-                f'{author.__str__().split(" -")[0]} '
-                f'({recipes.filter(author=author).count()})'
-            ) for author in set(User.objects.filter(recipes__gt=0))
+            (username, f'{username} ({first_name} {last_name}) ({count})')
+            for username, first_name, last_name, count in cached_facet(
+                'authors', request, count_authors
+            )
         )
 
     def queryset(self, request, recipes):
@@ -118,58 +110,54 @@ class CookingTimeFilter(admin.SimpleListFilter):
     parameter_name = 'cooking_time'
 
     def lookups(self, request, model_admin):
-        cooking_times = [
-            recipe.cooking_time for recipe in Recipe.objects.all()
-        ]
-        if len(cooking_times) < 3:
+        buckets = cached_facet('cooking_times', request, count_cooking_times)
+        if buckets is None:
             return None
-        max_cooking_time, min_cooking_time = (
-            max(cooking_times), min(cooking_times)
-        )
-        if max_cooking_time - min_cooking_time < 3:
-            return None
-        fast = (max_cooking_time + min_cooking_time) // 3
-        medium = (max_cooking_time + min_cooking_time) // 3 * 2
-        cooking_times_dynamic = dynamic_queryset(
-            request, Recipe.objects.all()
-        ).values_list('cooking_time', flat=True)
-        fast_times = 0
-        medium_times = 0
-        long_times = 0
-        for time in cooking_times_dynamic:
-            if time < fast:
-                fast_times += 1
-            elif fast <= time < medium:
-                medium_times += 1
-            else:
-                long_times += 1
+        fast, medium, longest, counts = buckets
         return (
-            ((0, fast - 1), f'быстрее {fast} мин ({fast_times})'),
-            ((fast, medium - 1), f'быстрее {medium} мин ({medium_times})'),
-            ((medium, max_cooking_time), f'долго ({long_times})')
+            (
+                format_range(0, fast - 1),
+                f'быстрее {fast} мин ({counts["fast"]})'
+            ),
+            (
+                format_range(fast, medium - 1),
+                f'быстрее {medium} мин ({counts["medium"]})'
+            ),
+            (
+                format_range(medium, longest),
+                f'долго ({counts["long"]})'
+            )
         )
 
     def queryset(self, request, recipes):
-        if self.value():
-            return recipes.filter(cooking_time__range=eval(self.value()))
+        cooking_time = parse_range(self.value())
+        if cooking_time:
+            return recipes.filter(cooking_time__range=cooking_time)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'display_image', 'name', 'author', 'display_tags',
-        'display_ingredients', 'cooking_time', 'in_favorite_count', 'pub_time'
+        'display_ingredients', 'cooking_time', 'favorites_count', 'pub_time'
     )
     inlines = [RecipeIngredientInline]
     list_filter = (CookingTimeFilter, TagFilter, AuthorWithRecipesFilter)
     filter_horizontal = ('tags',)
     search_fields = ('name',)
-    readonly_fields = ('in_favorite_count',)
+    readonly_fields = ('favorites_count', 'shopping_carts_count')
     list_display_links = ('display_image', 'name')
 
-    @admin.display(description='В избранном')
-    def in_favorite_count(self, recipe):
-        return recipe.favorites.count()
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_in_recipes',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
 
     @admin.display(description='Теги')
     @mark_safe
@@ -192,7 +180,7 @@ class RecipeAdmin(admin.ModelAdmin):
     @mark_safe
     def display_image(self, recipe):
         return (
-            f'<img src="{recipe.image.url}" '
+            f'<img src="{recipe.get_image_variant("thumbnail").url}" '
             'style="width:50px; height:50px;">'
         )
 
@@ -200,11 +188,13 @@ class RecipeAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    list_select_related = ('recipe__author', 'user')
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    list_select_related = ('recipe__author', 'user')
 
 
 class SubscribeFilter(admin.SimpleListFilter):
@@ -216,23 +206,21 @@ class SubscribeFilter(admin.SimpleListFilter):
         return (
             (
                 'subscribers',
-                f'Есть подписки ({len(set(users.filter(subscribers__gt=0)))})'
+                'Есть подписки '
+                f'({users.filter(subscriptions_count__gt=0).count()})'
             ),
             (
                 'authors',
-                f'Есть подписчики ({len(set(users.filter(authors__gt=0)))})'
+                'Есть подписчики '
+                f'({users.filter(subscribers_count__gt=0).count()})'
             ),
         )
 
     def queryset(self, request, users):
         if self.value() == 'subscribers':
-            return users.annotate(
-                num_subscriptions=Count('subscribers')
-            ).filter(num_subscriptions__gt=0)
+            return users.filter(subscriptions_count__gt=0)
         if self.value() == 'authors':
-            return users.annotate(
-                num_subscribers=Count('authors')
-            ).filter(num_subscribers__gt=0)
+            return users.filter(subscribers_count__gt=0)
 
 
 @admin.register(User)
@@ -244,19 +232,8 @@ class UserAdmin(UserAdmin):
     list_filter = (SubscribeFilter,)
     search_fields = ('username', 'email', 'first_name', 'last_name')
 
-    @admin.display(description='Рецепты')
-    def recipes_count(self, user):
-        return user.recipes.count()
-
-    @admin.display(description='Подписки')
-    def subscriptions_count(self, user):
-        return user.subscribers.count()
-
-    @admin.display(description='Подписчики')
-    def subscribers_count(self, user):
-        return user.authors.count()
-
 
 @admin.register(Subscribe)
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ('author', 'subscriber')
+    list_select_related = ('author', 'subscriber')
@@ -0,0 +1,90 @@
+import re
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+
+from .models import Recipe, Tag, User
+
+FACETS_CACHE_TIMEOUT = 30
+FACETS_CACHE_KEY = 'recipe_facets:{}:{}'
+RANGE_PATTERN = re.compile(r'^(\d+)-(\d+)$')
+MIN_RECIPES_FOR_BUCKETS = 3
+MIN_SPREAD_FOR_BUCKETS = 3
+
+
+def parse_range(value):
+    match = RANGE_PATTERN.match(value or '')
+    if not match:
+        return None
+    return int(match[1]), int(match[2])
+
+
+def format_range(low, high):
+    return f'{low}-{high}'
+
+
+def filter_recipes(request, recipes):
+    author = request.GET.get('author')
+    if author:
+        recipes = recipes.filter(author__username=author)
+    tag = request.GET.get('tag')
+    if tag:
+        recipes = recipes.filter(tags__slug=tag)
+    cooking_time = parse_range(request.GET.get('cooking_time'))
+    if cooking_time:
+        recipes = recipes.filter(cooking_time__range=cooking_time)
+    return recipes
+
+
+def cached_facet(name, request, compute):
+    key = FACETS_CACHE_KEY.format(
+        name, md5(request.GET.urlencode().encode()).hexdigest()
+    )
+    facet = cache.get(key)
+    if facet is None:
+        facet = compute(filter_recipes(request, Recipe.objects.all()))
+        cache.set(key, facet, FACETS_CACHE_TIMEOUT)
+    return facet
+
+
+def count_tags(recipes):
+    return [
+        (tag.slug, tag.name, tag.filtered_count)
+        for tag in Tag.objects.annotate(filtered_count=Count(
+            'recipes', filter=Q(recipes__in=recipes.values('pk'))
+        ))
+    ]
+
+
+def count_authors(recipes):
+    return [
+        (author.username, author.first_name, author.last_name,
+         author.filtered_count)
+        for author in User.objects.filter(recipes_count__gt=0).annotate(
+            filtered_count=Count(
+                'recipes', filter=Q(recipes__in=recipes.values('pk'))
+            )
+        )
+    ]
+
+
+def count_cooking_times(recipes):
+    total = Recipe.objects.aggregate(
+        count=Count('pk'), low=Min('cooking_time'), high=Max('cooking_time')
+    )
+    if (
+        total['count'] < MIN_RECIPES_FOR_BUCKETS
+        or total['high'] - total['low'] < MIN_SPREAD_FOR_BUCKETS
+    ):
+        return None
+    fast = (total['high'] + total['low']) // 3
+    medium = fast * 2
+    counts = recipes.aggregate(
+        fast=Count('pk', filter=Q(cooking_time__lt=fast)),
+        medium=Count(
+            'pk', filter=Q(cooking_time__gte=fast, cooking_time__lt=medium)
+        ),
+        long=Count('pk', filter=Q(cooking_time__gte=medium)),
+    )
+    return fast, medium, total['high'], counts
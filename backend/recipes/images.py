@@ -0,0 +1,115 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe, Tag
+from .versions import bump_recipe_versions
+
+VARIANT_FIELDS = ('thumbnail', 'thumbnail_webp', 'image_webp')
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+BUILD_FAILED = 'Не удалось собрать варианты картинки рецепта %s'
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANTS_WORKERS,
+    thread_name_prefix='image-variants'
+)
+
+
+def encode(image, image_format, **options):
+    buffer = BytesIO()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(image):
+    thumbnail = ImageOps.fit(
+        image, settings.RECIPE_THUMBNAIL_SIZE, Image.LANCZOS
+    )
+    variants = {
+        'thumbnail': (
+            'jpg', encode(thumbnail, 'JPEG', quality=JPEG_QUALITY)
+        ),
+    }
+    if features.check('webp'):
+        variants['thumbnail_webp'] = (
+            'webp', encode(thumbnail, 'WEBP', quality=WEBP_QUALITY)
+        )
+        variants['image_webp'] = (
+            'webp', encode(image, 'WEBP', quality=WEBP_QUALITY)
+        )
+    return variants
+
+
+def build_image_variants(recipe):
+    source = recipe.image.name
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    stem = PurePosixPath(source).stem
+    old_names = [
+        getattr(recipe, field).name for field in VARIANT_FIELDS
+        if getattr(recipe, field)
+    ]
+    values = dict.fromkeys(VARIANT_FIELDS, '')
+    for field, (extension, content) in render_variants(image).items():
+        variant = getattr(recipe, field)
+        variant.save(f'{stem}.{extension}', ContentFile(content), save=False)
+        values[field] = variant.name
+    new_names = [name for name in values.values() if name]
+    updated_at = timezone.now()
+    if Recipe.objects.filter(pk=recipe.pk, image=source).update(
+        image_variants_source=source, updated_at=updated_at, **values
+    ):
+        recipe.image_variants_source = source
+        recipe.updated_at = updated_at
+        bump_recipe_versions(
+            [recipe.author_id],
+            Tag.objects.filter(recipes=recipe.pk).values_list(
+                'slug', flat=True
+            )
+        )
+        stale_names = set(old_names) - set(new_names)
+    else:
+        stale_names = new_names
+    for name in stale_names:
+        storage.delete(name)
+
+
+def build_image_variants_safely(recipe):
+    try:
+        build_image_variants(recipe)
+    except (OSError, ValueError):
+        logger.exception(BUILD_FAILED, recipe.pk)
+
+
+def build_image_variants_by_id(recipe_id):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is not None and recipe.image:
+            build_image_variants_safely(recipe)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_variants(recipe):
+    if not recipe.image or recipe.image_variants_source == recipe.image.name:
+        return
+    if settings.IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(
+            lambda: executor.submit(build_image_variants_by_id, recipe.pk)
+        )
+    else:
+        build_image_variants_safely(recipe)
@@ -0,0 +1,162 @@
+import json
+from math import ceil
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag, User
+
+HOST = 'testserver'
+NO_USER_ERROR = 'Нет пользователя с подписками и списком покупок'
+NO_RECIPES_ERROR = 'В базе нет рецептов, запустите generate_data'
+BAD_STATUS_ERROR = '{}: ответ {}'
+REGRESSION = '{}: {} было {}, стало {}'
+REGRESSIONS_ERROR = 'Найдено регрессий: {}'
+REPORT = '{:<28} p50 {:>8.2f} мс  p99 {:>8.2f} мс  запросов {:>3}'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, ceil(fraction * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку и число SQL-запросов основных эндпоинтов и '
+        'сравнивает их с сохранённым эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--user', help='Имя пользователя, от которого идут запросы'
+        )
+        parser.add_argument(
+            '--output', type=Path, help='Куда сохранить результаты в JSON'
+        )
+        parser.add_argument(
+            '--baseline', type=Path, help='JSON с эталонными результатами'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p99 относительно эталона'
+        )
+
+    def get_user(self, username):
+        if username:
+            return User.objects.get(username=username)
+        user = User.objects.filter(
+            subscriptions_count__gt=0,
+            pk__in=ShoppingCart.objects.values('user')
+        ).order_by('-subscriptions_count').first()
+        if user is None:
+            raise CommandError(NO_USER_ERROR)
+        return user
+
+    def get_scenarios(self, user):
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if recipe is None:
+            raise CommandError(NO_RECIPES_ERROR)
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = Ingredient.objects.order_by('?').first()
+        word = recipe.name.split()[0]
+        return (
+            ('recipes_list_anonymous', False, '/api/recipes/', {}),
+            ('recipes_list', True, '/api/recipes/', {}),
+            (
+                'recipes_list_filtered', True, '/api/recipes/',
+                {'tags': tags, 'is_favorited': 0}
+            ),
+            (
+                'recipes_list_author', True, '/api/recipes/',
+                {'author': recipe.author_id}
+            ),
+            ('recipes_search', True, '/api/recipes/', {'search': word}),
+            ('recipes_feed', True, '/api/recipes/feed/', {}),
+            ('recipe_detail', True, f'/api/recipes/{recipe.pk}/', {}),
+            (
+                'subscriptions', True, '/api/users/subscriptions/',
+                {'recipes_limit': 3}
+            ),
+            (
+                'shopping_cart_download', True,
+                '/api/recipes/download_shopping_cart/', {}
+            ),
+            (
+                'ingredients_search', False, '/api/ingredients/',
+                {'name': ingredient.name[:3] if ingredient else 'а'}
+            ),
+        )
+
+    def measure(self, client, path, params, iterations, warmup, headers):
+        timings = []
+        queries = 0
+        for iteration in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                response = client.get(path, params, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = perf_counter() - start
+            if response.status_code != 200:
+                raise CommandError(
+                    BAD_STATUS_ERROR.format(path, response.status_code)
+                )
+            if iteration >= warmup:
+                timings.append(elapsed * 1000)
+                queries = max(queries, len(context))
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': queries,
+        }
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        token = Token.objects.get_or_create(user=user)[0]
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        client = Client()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+            for name, authorized, path, params in self.get_scenarios(user):
+                results[name] = self.measure(
+                    client, path, params, options['iterations'],
+                    options['warmup'], auth if authorized else {}
+                )
+                self.stdout.write(REPORT.format(
+                    name, results[name]['p50_ms'], results[name]['p99_ms'],
+                    results[name]['queries']
+                ))
+        if options['output']:
+            options['output'].write_text(json.dumps(results, indent=2))
+        if options['baseline']:
+            self.compare(
+                results, json.loads(options['baseline'].read_text()),
+                options['tolerance']
+            )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, expected in baseline.items():
+            actual = results.get(name)
+            if actual is None:
+                continue
+            if actual['queries'] > expected['queries']:
+                regressions.append(REGRESSION.format(
+                    name, 'запросов', expected['queries'], actual['queries']
+                ))
+            if actual['p99_ms'] > expected['p99_ms'] * (1 + tolerance):
+                regressions.append(REGRESSION.format(
+                    name, 'p99', expected['p99_ms'], actual['p99_ms']
+                ))
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(REGRESSIONS_ERROR.format(len(regressions)))
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.benchmark import percentile
+from recipes.models import ShoppingCart, User
+
+HOST = '127.0.0.1'
+SLOW_PATH = '/api/recipes/download_shopping_cart/'
+FAST_PATH = '/api/tags/'
+REQUEST = (
+    'GET {} HTTP/1.1\r\nHost: localhost\r\n{}Connection: close\r\n\r\n'
+)
+STARTUP_TIMEOUT = 30
+RECEIVE_BUFFER = 1024
+SLOW_CHUNK = 8
+NO_USER_ERROR = 'Нет пользователя со списком покупок'
+STARTUP_ERROR = 'Сервер в режиме {} не запустился'
+REPORT = (
+    '{:<5} быстрые: {:>7.1f} з/с  p50 {:>8.2f} мс  p99 {:>8.2f} мс  '
+    'ошибок {:>4}; медленные: завершено {:>4}, ошибок {:>4}'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность сервера в режимах WSGI и ASGI, '
+        'пока медленные клиенты скачивают список покупок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', choices=('wsgi', 'asgi'),
+            default=('wsgi', 'asgi')
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--port', type=int, default=9100)
+        parser.add_argument('--slow-clients', type=int, default=20)
+        parser.add_argument('--fast-clients', type=int, default=10)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность нагрузки на каждый режим в секундах'
+        )
+        parser.add_argument(
+            '--delay', type=float, default=0.2,
+            help='Пауза медленного клиента между порциями данных'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=5,
+            help='Таймаут запроса быстрого клиента'
+        )
+        parser.add_argument(
+            '--user', help='Имя пользователя, чей список покупок скачивается'
+        )
+        parser.add_argument(
+            '--output', type=Path, help='Куда сохранить результаты в JSON'
+        )
+
+    def get_token(self, username):
+        users = User.objects.all()
+        if username:
+            users = users.filter(username=username)
+        user = users.filter(
+            pk__in=ShoppingCart.objects.values('user')
+        ).first()
+        if user is None:
+            raise CommandError(NO_USER_ERROR)
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def handle(self, *args, **options):
+        token = self.get_token(options['user'])
+        results = {}
+        for mode in options['modes']:
+            server = self.start_server(mode, options)
+            try:
+                results[mode] = asyncio.run(self.load(token, options))
+            finally:
+                server.terminate()
+                server.wait()
+            self.stdout.write(REPORT.format(
+                mode, results[mode]['fast_rps'], results[mode]['fast_p50_ms'],
+                results[mode]['fast_p99_ms'], results[mode]['fast_errors'],
+                results[mode]['slow_completed'], results[mode]['slow_errors']
+            ))
+        if options['output']:
+            options['output'].write_text(json.dumps(results, indent=2))
+
+    def start_server(self, mode, options):
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '-c', str(settings.BASE_DIR / 'gunicorn.conf.py')
+            ],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'SERVER_MODE': mode,
+                'SERVER_BIND': f'{HOST}:{options["port"]}',
+                'SERVER_WORKERS': str(options['workers']),
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        deadline = monotonic() + STARTUP_TIMEOUT
+        while monotonic() < deadline and server.poll() is None:
+            try:
+                socket.create_connection((HOST, options['port']), 1).close()
+                return server
+            except OSError:
+                sleep(0.1)
+        server.terminate()
+        server.wait()
+        raise CommandError(STARTUP_ERROR.format(mode))
+
+    async def load(self, token, options):
+        deadline = monotonic() + options['duration']
+        fast_timings, fast_errors = [], [0]
+        slow_results = {'completed': 0, 'errors': 0}
+        await asyncio.gather(
+            *(
+                self.slow_client(
+                    token, options['port'], options['delay'], deadline,
+                    slow_results
+                )
+                for _ in range(options['slow_clients'])
+            ),
+            *(
+                self.fast_client(
+                    options['port'], options['timeout'], deadline,
+                    fast_timings, fast_errors
+                )
+                for _ in range(options['fast_clients'])
+            )
+        )
+        timings = fast_timings or [0]
+        return {
+            'fast_requests': len(fast_timings),
+            'fast_rps': round(len(fast_timings) / options['duration'], 1),
+            'fast_p50_ms': round(percentile(timings, 0.5), 3),
+            'fast_p99_ms': round(percentile(timings, 0.99), 3),
+            'fast_errors': fast_errors[0],
+            'slow_completed': slow_results['completed'],
+            'slow_errors': slow_results['errors'],
+        }
+
+    async def open_connection(self, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (HOST, port))
+        return await asyncio.open_connection(
+            sock=sock, limit=RECEIVE_BUFFER
+        )
+
+    async def slow_client(self, token, port, delay, deadline, results):
+        request = REQUEST.format(
+            SLOW_PATH, f'Authorization: Token {token}\r\n'
+        ).encode()
+        while monotonic() < deadline:
+            try:
+                reader, writer = await self.open_connection(port)
+                for start in range(0, len(request), SLOW_CHUNK):
+                    writer.write(request[start:start + SLOW_CHUNK])
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+                status = await reader.readline()
+                while await reader.read(RECEIVE_BUFFER):
+                    await asyncio.sleep(delay)
+                writer.close()
+            except OSError:
+                results['errors'] += 1
+                continue
+            if b' 200 ' in status:
+                results['completed'] += 1
+            else:
+                results['errors'] += 1
+
+    async def fast_client(self, port, timeout, deadline, timings, errors):
+        request = REQUEST.format(FAST_PATH, '').encode()
+        while monotonic() < deadline:
+            start = perf_counter()
+            try:
+                status = await asyncio.wait_for(
+                    self.fetch(port, request), timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                errors[0] += 1
+                continue
+            if b' 200 ' in status:
+                timings.append((perf_counter() - start) * 1000)
+            else:
+                errors[0] += 1
+
+    async def fetch(self, port, request):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status = await reader.readline()
+            await reader.read()
+            return status
+        finally:
+            writer.close()
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+from django.db.models import F
+
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+FAILED = 'Рецепт {}: {}'
+SUMMARY = 'Собраны варианты картинок: {}, ошибок: {}'
+
+
+class Command(BaseCommand):
+    help = 'Собирает миниатюры и WebP-варианты картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать и уже готовые варианты'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.exclude(image_variants_source=F('image'))
+        built = failed = 0
+        for recipe in recipes.iterator():
+            try:
+                build_image_variants(recipe)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(FAILED.format(recipe.pk, error))
+            else:
+                built += 1
+        self.stdout.write(SUMMARY.format(built, failed))
@@ -0,0 +1,271 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import (
+    COUNTERS, MAX_LENGTH, FeedEntry, Favorite, Ingredient, Recipe,
+    RecipeIngredient, ShoppingCart, Subscribe, Tag, User,
+    get_counter_expression
+)
+from recipes.search import rebuild_index
+from recipes.versions import bump_recipe_versions
+
+USERNAME_PREFIX = 'synthetic_'
+PASSWORD = 'synthetic-password'
+IMAGE_NAME = 'recipes/images/synthetic.png'
+IMAGE_SIZE = (600, 400)
+SEED_FILES = (
+    ('ingredients', Ingredient, 'ingredients.json'),
+    ('tags', Tag, 'tags.json'),
+)
+TEXT_WORDS = (
+    'нарезать', 'смешать', 'обжарить', 'запечь', 'посолить', 'поперчить',
+    'добавить', 'варить', 'остудить', 'подавать', 'взбить', 'тушить'
+)
+RELATIONS = ((Favorite, 'favorites'), (ShoppingCart, 'carts'))
+PROGRESS = '{}: {}'
+SUMMARY = (
+    'Пользователей: {}, рецептов: {}, избранного: {}, покупок: {}, '
+    'подписок: {}'
+)
+
+
+def get_weights(count, skew):
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def sample(rng, population, cum_weights, count):
+    if not population or count <= 0:
+        return set()
+    count = min(count, len(population))
+    return set(rng.choices(population, cum_weights=cum_weights, k=count))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, рецепты, избранное, списки '
+        'покупок и подписки для нагрузочных проверок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число избранных рецептов у пользователя'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее число рецептов в списке покупок'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX'), help='Продуктов в рецепте'
+        )
+        parser.add_argument(
+            '--tags', type=int, nargs=2, default=(1, 2),
+            metavar=('MIN', 'MAX'), help='Тегов у рецепта'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help=(
+                'Показатель распределения Ципфа для популярности авторов '
+                'и рецептов, 0 — равномерное'
+            )
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее созданные синтетические данные'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        if options['clear']:
+            User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).delete()
+        self.load_seeds()
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(user_ids, options)
+            counts = self.create_relations(user_ids, recipe_ids, options)
+            self.finish(user_ids)
+        self.stdout.write(self.style.SUCCESS(SUMMARY.format(
+            len(user_ids), len(recipe_ids), *counts
+        )))
+
+    def load_seeds(self):
+        for name, model, filename in SEED_FILES:
+            if not model.objects.exists():
+                call_command(
+                    'import_data', name, settings.BASE_DIR / 'data' / filename,
+                    stdout=self.stdout
+                )
+
+    def create_users(self, count):
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{USERNAME_PREFIX}{number}',
+                    email=f'{USERNAME_PREFIX}{number}@example.com',
+                    first_name='Синтетический',
+                    last_name=f'Пользователь {number}',
+                    password=password
+                )
+                for number in range(start, start + count)
+            ),
+            batch_size=self.batch_size
+        )
+        self.stdout.write(PROGRESS.format('Пользователи', count))
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True)[start:])
+
+    def create_image(self):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.new('RGB', IMAGE_SIZE, (230, 160, 90)).save(buffer, 'PNG')
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, user_ids, options):
+        rng = self.rng
+        ingredients = list(Ingredient.objects.values_list('pk', 'name'))
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        author_weights = get_weights(len(user_ids), options['skew'])
+        image = self.create_image()
+        now = timezone.now()
+        last_recipe_id = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        recipes = [
+            Recipe(
+                author_id=author_id,
+                name=' с '.join(
+                    name for _, name in rng.sample(ingredients, 2)
+                ).capitalize()[:MAX_LENGTH],
+                text=' '.join(rng.choices(TEXT_WORDS, k=40)),
+                cooking_time=max(1, int(rng.lognormvariate(3.3, 0.6))),
+                image=image
+            )
+            for author_id in rng.choices(
+                user_ids, cum_weights=author_weights, k=options['recipes']
+            )
+        ]
+        Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+        recipes = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX,
+            pk__gt=last_recipe_id
+        ).order_by('pk'))
+        for recipe in recipes:
+            recipe.pub_time = now - timedelta(
+                seconds=rng.randrange(options['days'] * 24 * 60 * 60 + 1)
+            )
+        Recipe.objects.bulk_update(
+            recipes, ['pub_time'], batch_size=self.batch_size
+        )
+        low, high = options['ingredients']
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient_id, _ in rng.sample(
+                    ingredients, min(len(ingredients), rng.randint(low, high))
+                )
+            ),
+            batch_size=self.batch_size, ignore_conflicts=True
+        )
+        low, high = options['tags']
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in rng.sample(
+                    tag_ids, min(len(tag_ids), rng.randint(low, high))
+                )
+            ),
+            batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.stdout.write(PROGRESS.format('Рецепты', len(recipes)))
+        return [recipe.pk for recipe in recipes]
+
+    def create_relations(self, user_ids, recipe_ids, options):
+        rng = self.rng
+        recipe_weights = get_weights(len(recipe_ids), options['skew'])
+        author_weights = get_weights(len(user_ids), options['skew'])
+        counts = []
+        for model, option in RELATIONS:
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in sample(
+                        rng, recipe_ids, recipe_weights,
+                        round(rng.expovariate(1 / options[option]))
+                        if options[option] else 0
+                    )
+                ),
+                batch_size=self.batch_size, ignore_conflicts=True
+            )
+            counts.append(model.objects.filter(
+                user__username__startswith=USERNAME_PREFIX
+            ).count())
+            self.stdout.write(PROGRESS.format(
+                model._meta.verbose_name_plural, counts[-1]
+            ))
+        Subscribe.objects.bulk_create(
+            (
+                Subscribe(subscriber_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in sample(
+                    rng, user_ids, author_weights,
+                    round(rng.expovariate(1 / options['subscriptions']))
+                    if options['subscriptions'] else 0
+                ) - {user_id}
+            ),
+            batch_size=self.batch_size, ignore_conflicts=True
+        )
+        counts.append(Subscribe.objects.filter(
+            subscriber__username__startswith=USERNAME_PREFIX
+        ).count())
+        self.stdout.write(PROGRESS.format('Подписки', counts[-1]))
+        return counts
+
+    def finish(self, user_ids):
+        for model, field, source, source_field in COUNTERS:
+            model.objects.update(
+                **{field: get_counter_expression(source, source_field)}
+            )
+        for user_id in user_ids:
+            FeedEntry.rebuild(user_id)
+        rebuild_index()
+        bump_recipe_versions(
+            tag_slugs=Tag.objects.values_list('slug', flat=True)
+        )
@@ -0,0 +1,198 @@
+import csv
+import json
+from collections import namedtuple
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import bump_version
+
+JSON_CHUNK_SIZE = 64 * 1024
+FORMATS = ('csv', 'json')
+ImportSpec = namedtuple(
+    'ImportSpec', ('model', 'columns', 'key_fields', 'update_fields')
+)
+SPECS = {
+    'ingredients': ImportSpec(
+        Ingredient, ('name', 'measurement_unit'),
+        ('name', 'measurement_unit'), ()
+    ),
+    'tags': ImportSpec(
+        Tag, ('name', 'color', 'slug'), ('slug',), ('name', 'color')
+    ),
+}
+UNKNOWN_FORMAT_ERROR = 'Не удалось определить формат файла {}'
+NOT_JSON_ARRAY_ERROR = 'JSON-файл должен содержать массив объектов'
+BROKEN_JSON_ERROR = 'JSON-файл оборван или повреждён'
+MISSING_FIELD_ERROR = 'Строка {}: нет поля {}'
+PROGRESS = 'Обработано строк: {}'
+SUMMARY = 'Прочитано: {}, добавлено: {}, обновлено: {}, пропущено: {}'
+
+
+def read_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError(NOT_JSON_ARRAY_ERROR)
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError(BROKEN_JSON_ERROR)
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_rows(file, file_format, columns):
+    if file_format == 'csv':
+        items = (dict(zip(columns, row)) for row in csv.reader(file) if row)
+    else:
+        items = read_json_array(file)
+    for line, item in enumerate(items, start=1):
+        try:
+            yield tuple(str(item[column]).strip() for column in columns)
+        except KeyError as error:
+            raise CommandError(MISSING_FIELD_ERROR.format(line, error))
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает продукты или теги из CSV или JSON, '
+        'обновляя уже существующие записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=SPECS)
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='file_format',
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, model, path, file_format, batch_size, **options):
+        file_format = file_format or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(UNKNOWN_FORMAT_ERROR.format(path))
+        spec = SPECS[model]
+        upsert = (
+            self.upsert_postgresql if connection.vendor == 'postgresql'
+            else self.upsert_batches
+        )
+        with open(path, encoding='utf8') as file, transaction.atomic():
+            total, created, updated = upsert(spec, batched(
+                read_rows(file, file_format, spec.columns), batch_size
+            ))
+        bump_version(model)
+        self.stdout.write(self.style.SUCCESS(SUMMARY.format(
+            total, created, updated, total - created - updated
+        )))
+
+    def upsert_batches(self, spec, batches):
+        model, columns, key_fields, update_fields = spec
+        total = created = updated = 0
+        key_indexes = [columns.index(field) for field in key_fields]
+        for batch in batches:
+            total += len(batch)
+            rows = {
+                tuple(row[index] for index in key_indexes): row
+                for row in batch
+            }
+            existing = {
+                tuple(getattr(item, field) for field in key_fields): item
+                for item in model.objects.filter(**{
+                    f'{key_fields[0]}__in': {key[0] for key in rows}
+                })
+            }
+            new_items = []
+            changed_items = []
+            for key, row in rows.items():
+                values = dict(zip(columns, row))
+                item = existing.get(key)
+                if item is None:
+                    new_items.append(model(**values))
+                elif any(
+                    getattr(item, field) != values[field]
+                    for field in update_fields
+                ):
+                    for field in update_fields:
+                        setattr(item, field, values[field])
+                    changed_items.append(item)
+            model.objects.bulk_create(new_items)
+            if changed_items:
+                model.objects.bulk_update(changed_items, update_fields)
+            created += len(new_items)
+            updated += len(changed_items)
+            self.stdout.write(PROGRESS.format(total))
+        return total, created, updated
+
+    @staticmethod
+    def get_on_conflict(table, update_fields):
+        if not update_fields:
+            return 'DO NOTHING'
+        assignments = ', '.join(
+            f'{field} = EXCLUDED.{field}' for field in update_fields
+        )
+        current = ', '.join(f'{table}.{field}' for field in update_fields)
+        excluded = ', '.join(f'EXCLUDED.{field}' for field in update_fields)
+        return (
+            f'DO UPDATE SET {assignments} '
+            f'WHERE ({current}) IS DISTINCT FROM ({excluded})'
+        )
+
+    def upsert_postgresql(self, spec, batches):
+        model, columns, key_fields, update_fields = spec
+        table = model._meta.db_table
+        staging = f'import_{table}'
+        column_list = ', '.join(columns)
+        key_list = ', '.join(key_fields)
+        on_conflict = self.get_on_conflict(table, update_fields)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {column_list} FROM {table} WITH NO DATA'
+            )
+            for batch in batches:
+                buffer = StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {staging} ({column_list}) FROM STDIN '
+                    'WITH (FORMAT csv)',
+                    buffer
+                )
+                total += len(batch)
+                self.stdout.write(PROGRESS.format(total))
+            cursor.execute(
+                f'WITH upserted AS ('
+                f'INSERT INTO {table} ({column_list}) '
+                f'SELECT DISTINCT ON ({key_list}) {column_list} '
+                f'FROM {staging} ORDER BY {key_list} '
+                f'ON CONFLICT ({key_list}) {on_conflict} '
+                f'RETURNING xmax = 0 AS inserted) '
+                f'SELECT count(*) FILTER (WHERE inserted), '
+                f'count(*) FILTER (WHERE NOT inserted) FROM upserted'
+            )
+            created, updated = cursor.fetchone()
+        return total, created, updated
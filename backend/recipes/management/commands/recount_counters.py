@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.models import COUNTERS, get_counter_expression
+
+REPORT = '{}.{}: расходится {}, пересчитано {}'
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения'
+        )
+
+    def handle(self, *args, **options):
+        for model, field, source, source_field in COUNTERS:
+            expression = get_counter_expression(source, source_field)
+            with transaction.atomic():
+                mismatched = model.objects.annotate(
+                    actual=expression
+                ).exclude(**{field: F('actual')}).count()
+                updated = 0
+                if mismatched and not options['dry_run']:
+                    updated = model.objects.update(**{field: expression})
+            self.stdout.write(REPORT.format(
+                model.__name__, field, mismatched, updated
+            ))
@@ -0,0 +1,43 @@
+import sqlite3
+from contextlib import closing
+from time import sleep
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.replicas import REPLICA_DB_ALIAS, replica_configured
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+NOT_CONFIGURED_ERROR = 'Реплика не настроена, задайте DB_REPLICA'
+NOT_SQLITE_ERROR = 'Копирование поддерживается только для SQLite'
+SYNCED = 'Реплика {} обновлена из {}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файл реплики, имитируя '
+        'репликацию для локальной проверки маршрутизации чтения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Повторять копирование с этим интервалом в секундах'
+        )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(NOT_CONFIGURED_ERROR)
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[REPLICA_DB_ALIAS]
+        if primary['ENGINE'] != SQLITE_ENGINE:
+            raise CommandError(NOT_SQLITE_ERROR)
+        while True:
+            with closing(sqlite3.connect(primary['NAME'])) as source:
+                with closing(sqlite3.connect(replica['NAME'])) as target:
+                    source.backup(target)
+            self.stdout.write(SYNCED.format(replica['NAME'], primary['NAME']))
+            if options['interval'] is None:
+                return
+            sleep(options['interval'])
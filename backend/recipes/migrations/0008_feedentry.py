@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('recipes', 'Subscribe')
+    subscribers = Subscribe.objects.values('subscriber').annotate(
+        subscriptions_count=Count('id')
+    ).filter(
+        subscriptions_count__lte=settings.FEED_MAX_SUBSCRIPTIONS
+    ).values_list('subscriber', flat=True)
+    for user_id in subscribers:
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in Recipe.objects.filter(
+                    author__authors__subscriber_id=user_id
+                ).values_list('id', flat=True).distinct()
+            ),
+            batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_pub_time_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Рецепты в лентах',
+                'ordering': ('user',),
+                'abstract': False,
+                'default_related_name': 'feed_entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('recipe', 'user'), name='unique_recipe_user_feedentry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
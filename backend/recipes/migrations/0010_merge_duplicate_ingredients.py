@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:48
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=duplicate['keep_id'])
+        RecipeIngredient.objects.filter(ingredient__in=extra).update(
+            ingredient_id=duplicate['keep_id']
+        )
+        extra.delete()
+        merged = RecipeIngredient.objects.filter(
+            ingredient_id=duplicate['keep_id']
+        ).values('recipe_id').annotate(
+            keep_id=Min('id'), total=Count('id'), total_amount=Sum('amount')
+        ).filter(total__gt=1)
+        for recipe_ingredient in merged:
+            RecipeIngredient.objects.filter(
+                id=recipe_ingredient['keep_id']
+            ).update(amount=recipe_ingredient['total_amount'])
+            RecipeIngredient.objects.filter(
+                recipe_id=recipe_ingredient['recipe_id'],
+                ingredient_id=duplicate['keep_id']
+            ).exclude(id=recipe_ingredient['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import Exists, OuterRef, Sum
+from django.db import models, transaction
+from django.db.models import (
+    Count, Exists, F, OuterRef, Prefetch, Subquery, Sum
+)
+from django.db.models.functions import Coalesce
 
 from .validators import validate_username
 
@@ -32,6 +36,15 @@ class User(AbstractUser):
         validators=[validate_username],
         verbose_name='Никнейм'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецепты'
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписки'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчики'
+    )
 
     class Meta:
         verbose_name = 'Пользователя'
@@ -46,16 +59,32 @@ class User(AbstractUser):
 class Subscribe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='authors',
-        verbose_name='Автор'
+        verbose_name='Автор', db_index=False
     )
     subscriber = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='subscribers',
-        verbose_name='Подписчик'
+        verbose_name='Подписчик', db_index=False
     )
 
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['subscriber', 'author'],
+                name='unique_subscriber_author'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(subscriber=models.F('author')),
+                name='prevent_self_subscription'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'subscriber'],
+                name='subscribe_author_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.subscriber.username} подписан на {self.author.username}'
@@ -73,6 +102,12 @@ class Ingredient(models.Model):
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.measurement_unit})'
@@ -120,6 +155,27 @@ class RecipeQuerySet(models.QuerySet):
             )
         )
 
+    def for_read(self, user_id, prefetch=True):
+        recipes = self.add_user_annotations(user_id).select_related('author')
+        if not prefetch:
+            return recipes
+        return recipes.prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_in_recipes',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('pk')
+            )
+        )
+
+    def feed(self, user):
+        if FeedEntry.uses_timeline(user):
+            return self.filter(feed_entries__user=user)
+        return self.filter(Exists(Subscribe.objects.filter(
+            subscriber=user, author_id=OuterRef('author_id')
+        )))
+
 
 class Recipe(models.Model):
     name = models.CharField(
@@ -138,6 +194,22 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/images', verbose_name='Картинка'
     )
+    image_webp = models.ImageField(
+        upload_to='recipes/images', blank=True, editable=False,
+        verbose_name='Картинка WebP'
+    )
+    thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails', blank=True, editable=False,
+        verbose_name='Миниатюра'
+    )
+    thumbnail_webp = models.ImageField(
+        upload_to='recipes/thumbnails', blank=True, editable=False,
+        verbose_name='Миниатюра WebP'
+    )
+    image_variants_source = models.CharField(
+        max_length=MAX_LENGTH, blank=True, editable=False,
+        verbose_name='Картинка, из которой собраны варианты'
+    )
     text = models.TextField(verbose_name='Описание')
     cooking_time = models.IntegerField(
         validators=[MinValueValidator(MIN_VALUE_COOKING_TIME)],
@@ -146,18 +218,38 @@ class Recipe(models.Model):
     pub_time = models.DateTimeField(
         auto_now_add=True, verbose_name='Время публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Время изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном'
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В списках покупок'
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_time',)
+        ordering = ('-pub_time', '-id')
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=('-pub_time', '-id'), name='recipe_pub_time_id_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.author.username}) {self.pub_time}'
 
+    def get_image_variant(self, field):
+        variant = getattr(self, field)
+        if variant and self.image_variants_source == self.image.name:
+            return variant
+        return self.image
+
 
 class RecipeIngredient(models.Model):
     ingredient = models.ForeignKey(
@@ -185,10 +277,12 @@ class RecipeIngredient(models.Model):
 
 class BaseUserRecipeModel(models.Model):
     recipe = models.ForeignKey(
-        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт'
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
+        db_index=False
     )
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, verbose_name='Пользователь'
+        User, on_delete=models.CASCADE, verbose_name='Пользователь',
+        db_index=False
     )
 
     class Meta:
@@ -201,6 +295,45 @@ class BaseUserRecipeModel(models.Model):
                 name='unique_recipe_user_%(class)s'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'], name='%(class)s_user_recipe_idx'
+            )
+        ]
+
+    @staticmethod
+    def lock_user(user):
+        User.objects.select_for_update().get(pk=user.pk)
+
+    @classmethod
+    def add_recipes(cls, user, recipe_ids):
+        with transaction.atomic():
+            cls.lock_user(user)
+            found_ids = set(Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', flat=True))
+            added_ids = found_ids - set(cls.objects.filter(
+                user=user, recipe_id__in=found_ids
+            ).values_list('recipe_id', flat=True))
+            cls.objects.bulk_create(
+                [cls(user=user, recipe_id=pk) for pk in added_ids],
+                ignore_conflicts=True
+            )
+            update_counters(cls, 'recipe', added_ids, 1)
+        return found_ids, added_ids
+
+    @classmethod
+    def remove_recipes(cls, user, recipe_ids):
+        with transaction.atomic():
+            cls.lock_user(user)
+            found_ids = set(Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', flat=True))
+            items = cls.objects.filter(user=user, recipe_id__in=found_ids)
+            removed_ids = set(items.values_list('recipe_id', flat=True))
+            items._raw_delete(items.db)
+            update_counters(cls, 'recipe', removed_ids, -1)
+        return found_ids, removed_ids
 
 
 class Favorite(BaseUserRecipeModel):
@@ -226,8 +359,137 @@ class ShoppingCart(BaseUserRecipeModel):
         return [
             Ingredient.objects.filter(recipes__in=recipes_id).annotate(
                 total_amount=Sum('ingredients_in_recipes__amount')
-            ),
+            ).order_by('name'),
             Recipe.objects.filter(id__in=recipes_id).values_list(
                 'name', flat=True
             )
         ]
+
+
+class FeedEntry(BaseUserRecipeModel):
+    class Meta(BaseUserRecipeModel.Meta):
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в лентах'
+        default_related_name = 'feed_entries'
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте {self.user.username}'
+
+    @staticmethod
+    def uses_timeline(user):
+        return user.subscriptions_count <= settings.FEED_MAX_SUBSCRIPTIONS
+
+    @staticmethod
+    def get_subscriptions_count(user_id):
+        return User.objects.values_list(
+            'subscriptions_count', flat=True
+        ).get(pk=user_id)
+
+    @classmethod
+    def add_recipe(cls, recipe):
+        cls.objects.bulk_create(
+            (
+                cls(user_id=user_id, recipe=recipe)
+                for user_id in Subscribe.objects.filter(
+                    author_id=recipe.author_id,
+                    subscriber__subscriptions_count__lte=(
+                        settings.FEED_MAX_SUBSCRIPTIONS
+                    )
+                ).values_list('subscriber', flat=True)
+            ),
+            batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+        )
+
+    @classmethod
+    def add_subscription(cls, subscribe):
+        subscriptions_count = cls.get_subscriptions_count(
+            subscribe.subscriber_id
+        )
+        if subscriptions_count > settings.FEED_MAX_SUBSCRIPTIONS:
+            if subscriptions_count == settings.FEED_MAX_SUBSCRIPTIONS + 1:
+                cls.objects.filter(user_id=subscribe.subscriber_id).delete()
+            return
+        cls.objects.bulk_create(
+            (
+                cls(user_id=subscribe.subscriber_id, recipe_id=recipe_id)
+                for recipe_id in Recipe.objects.filter(
+                    author_id=subscribe.author_id
+                ).values_list('id', flat=True)
+            ),
+            batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+        )
+
+    @classmethod
+    def remove_subscription(cls, subscribe):
+        cls.objects.filter(
+            user_id=subscribe.subscriber_id,
+            recipe__author_id=subscribe.author_id
+        ).delete()
+        if User.objects.filter(
+            pk=subscribe.subscriber_id,
+            subscriptions_count=settings.FEED_MAX_SUBSCRIPTIONS
+        ).exists():
+            transaction.on_commit(
+                lambda: cls.rebuild(subscribe.subscriber_id)
+            )
+
+    @classmethod
+    def rebuild(cls, user_id):
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return
+        cls.objects.filter(user=user).delete()
+        if not cls.uses_timeline(user):
+            return
+        cls.objects.bulk_create(
+            (
+                cls(user=user, recipe_id=recipe_id)
+                for recipe_id in Recipe.objects.filter(
+                    author__authors__subscriber=user
+                ).values_list('id', flat=True).distinct()
+            ),
+            batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscriptions_count', Subscribe, 'subscriber'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+def get_counter_expression(source, source_field):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(
+                **{source_field: OuterRef('pk')}
+            ).order_by().values(source_field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def update_counters(sender, source_field, pks, delta):
+    if not pks:
+        return
+    for model, field, source, counted_field in COUNTERS:
+        if source is not sender or counted_field != source_field:
+            continue
+        counters = model.objects.filter(pk__in=pks)
+        if delta < 0:
+            counters = counters.filter(**{f'{field}__gt': 0})
+        counters.update(**{field: F(field) + delta})
+
+
+def change_counters(sender, instance, delta):
+    for model, field, source, source_field in COUNTERS:
+        if source is sender:
+            update_counters(
+                sender, source_field,
+                [getattr(instance, f'{source_field}_id')], delta
+            )
@@ -0,0 +1,88 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField
+)
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+RECIPE_TABLE = 'recipes_recipe'
+WORD_PATTERN = re.compile(r'\w+')
+FTS_INSERT = (
+    f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+    f"SELECT id, REPLACE(REPLACE(name, 'ё', 'е'), 'Ё', 'Е'), "
+    f"REPLACE(REPLACE(text, 'ё', 'е'), 'Ё', 'Е') FROM {RECIPE_TABLE}"
+)
+FTS_MATCH = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+FTS_RANK = (
+    f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s AND rowid = {RECIPE_TABLE}.id'
+)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def normalize(value):
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def index_recipe(recipe):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk]
+        )
+        cursor.execute(f'{FTS_INSERT} WHERE id = %s', [recipe.pk])
+
+
+def unindex_recipe(recipe):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk]
+        )
+
+
+def search_recipes(recipes, query):
+    ordering = ('-search_rank', *recipes.model._meta.ordering)
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        vector = RawSQL(
+            f'{RECIPE_TABLE}.search_vector', [],
+            output_field=SearchVectorField()
+        )
+        return recipes.alias(search_vector=vector).filter(
+            search_vector=search_query
+        ).annotate(
+            search_rank=SearchRank(vector, search_query)
+        ).order_by(*ordering)
+    if not uses_fts():
+        return recipes.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    words = WORD_PATTERN.findall(normalize(query))
+    if not words:
+        return recipes.none()
+    match = ' '.join(f'"{word}"*' for word in words)
+    return recipes.filter(
+        pk__in=RawSQL(FTS_MATCH, [match])
+    ).annotate(
+        search_rank=RawSQL(FTS_RANK, [match], output_field=FloatField())
+    ).order_by(*ordering)
+
+
+def rebuild_index():
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(FTS_INSERT)
@@ -0,0 +1,149 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from .images import schedule_image_variants
+from .models import (
+    FeedEntry, Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Subscribe, Tag, User, change_counters
+)
+from .search import index_recipe, unindex_recipe
+from .versions import bump_recipe_versions, bump_version
+
+COUNTED_MODELS = (Favorite, ShoppingCart, Recipe, Subscribe)
+
+
+def increment_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counters(sender, instance, 1)
+
+
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(sender, instance, -1)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(increment_counters, sender=model)
+    post_delete.connect(decrement_counters, sender=model)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.add_recipe(instance)
+
+
+@receiver(post_save, sender=Subscribe)
+def add_subscription_to_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.add_subscription(instance)
+
+
+@receiver(post_delete, sender=Subscribe)
+def remove_subscription_from_feed(sender, instance, **kwargs):
+    FeedEntry.remove_subscription(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_image_variants(sender, instance, **kwargs):
+    schedule_image_variants(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_version('ingredients')
+
+
+def get_tag_slugs(recipe_ids):
+    return set(Tag.objects.filter(
+        recipes__in=recipe_ids
+    ).values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def bump_saved_recipe_versions(sender, instance, **kwargs):
+    bump_recipe_versions([instance.author_id], get_tag_slugs([instance.pk]))
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_tags(sender, instance, **kwargs):
+    instance.deleted_tag_slugs = get_tag_slugs([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_deleted_recipe_versions(sender, instance, **kwargs):
+    bump_recipe_versions(
+        [instance.author_id], getattr(instance, 'deleted_tag_slugs', ())
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def bump_recipe_ingredient_versions(sender, instance, **kwargs):
+    bump_recipe_versions(
+        Recipe.objects.filter(
+            pk=instance.recipe_id
+        ).values_list('author_id', flat=True),
+        get_tag_slugs([instance.recipe_id])
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_recipe_relation_versions(sender, instance, action, reverse,
+                                  pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        tag_slugs = get_tag_slugs([instance.pk])
+        if sender is Recipe.tags.through and pk_set:
+            tag_slugs.update(Tag.objects.filter(
+                pk__in=pk_set
+            ).values_list('slug', flat=True))
+        bump_recipe_versions([instance.author_id], tag_slugs)
+        return
+    recipes = (
+        Recipe.objects.filter(pk__in=pk_set) if pk_set
+        else instance.recipes.all()
+    )
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    tag_slugs = get_tag_slugs(recipe_ids)
+    if sender is Recipe.tags.through:
+        tag_slugs.add(instance.slug)
+    bump_recipe_versions(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list(
+            'author_id', flat=True
+        ).distinct(),
+        tag_slugs
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_author_recipe_versions(sender, instance, created, update_fields,
+                                **kwargs):
+    if created:
+        return
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        bump_recipe_versions(
+            [instance.pk],
+            get_tag_slugs(Recipe.objects.filter(author=instance).values('pk'))
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, update_fields, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    unindex_recipe(instance)
@@ -0,0 +1,277 @@
+import re
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Exists, OuterRef
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .images import build_image_variants
+
+from .models import (
+    FeedEntry, Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Subscribe, Tag, User
+)
+from .versions import (
+    AUTHOR_RECIPES_VERSION, RECIPES_VERSION, TAG_RECIPES_VERSION, get_versions
+)
+
+IMAGE = 'recipes/images/test.png'
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+CHANGELIST_QUERIES = {
+    Ingredient: 6,
+    Tag: 5,
+    RecipeIngredient: 5,
+    Recipe: 11,
+    Favorite: 5,
+    ShoppingCart: 5,
+    User: 7,
+    Subscribe: 5,
+}
+
+
+def get_plan_queries(user_id):
+    def user_recipes(model):
+        return Exists(model.objects.filter(
+            user_id=user_id, recipe_id=OuterRef('pk')
+        ))
+    return (
+        (
+            'Флаги избранного и покупок', Recipe,
+            Recipe.objects.add_user_annotations(user_id)
+        ),
+        (
+            'Фильтр избранного', Recipe,
+            Recipe.objects.filter(user_recipes(Favorite))
+        ),
+        (
+            'Фильтр списка покупок', Recipe,
+            Recipe.objects.filter(~user_recipes(ShoppingCart))
+        ),
+        (
+            'Рецепты в списке покупок', None,
+            ShoppingCart.objects.filter(user_id=user_id).values('recipe_id')
+        ),
+        (
+            'Лента подписок', None,
+            FeedEntry.objects.filter(user_id=user_id).values('recipe_id')
+        ),
+        (
+            'Флаг подписки', User,
+            User.objects.annotate(is_subscribed=Exists(
+                Subscribe.objects.filter(
+                    subscriber_id=user_id, author_id=OuterRef('pk')
+                )
+            ))
+        ),
+        (
+            'Подписки пользователя', None,
+            Subscribe.objects.filter(
+                subscriber_id=user_id
+            ).values('author_id')
+        ),
+        (
+            'Подписчики автора', None,
+            Subscribe.objects.filter(author_id=user_id).values('subscriber_id')
+        ),
+    )
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def create_rows(cls, count, offset=0):
+        users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                first_name='Имя', last_name='Фамилия', password='pass'
+            )
+            for number in range(offset, offset + count)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#0000{number:02d}',
+                slug=f'tag{number}'
+            )
+            for number in range(offset, offset + count)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'продукт {number}', measurement_unit='г'
+            )
+            for number in range(offset, offset + count)
+        ]
+        for number, user in enumerate(users):
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {offset + number}', text='Текст',
+                cooking_time=5 + number, image=IMAGE
+            )
+            recipe.tags.set(tags)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+            Favorite.objects.create(user=users[0], recipe=recipe)
+            ShoppingCart.objects.create(user=users[0], recipe=recipe)
+            if user != users[0]:
+                Subscribe.objects.create(subscriber=users[0], author=user)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.create_rows(5)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client.force_login(self.admin)
+
+    def assert_changelists_budget(self):
+        for model, queries in CHANGELIST_QUERIES.items():
+            with self.subTest(model=model.__name__):
+                for cache in caches.all():
+                    cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(reverse(
+                        f'admin:{model._meta.app_label}_'
+                        f'{model._meta.model_name}_changelist'
+                    ))
+                self.assertEqual(response.status_code, 200)
+
+    def test_changelist_query_budget_does_not_grow_with_rows(self):
+        self.assert_changelists_budget()
+        self.create_rows(7, offset=5)
+        self.assert_changelists_budget()
+
+
+class QueryPlanTests(TestCase):
+    def test_relation_queries_use_indexes(self):
+        pattern = SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f'EXPLAIN не разбирается для {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        user = User.objects.create_user(
+            username='planner', email='planner@example.com', password='pass'
+        )
+        for name, scanned_model, queryset in get_plan_queries(user.pk):
+            with self.subTest(name):
+                allowed = {
+                    scanned_model._meta.db_table
+                } if scanned_model else set()
+                plan = queryset.explain()
+                self.assertEqual(
+                    set(pattern.findall(plan)) - allowed, set(), plan
+                )
+
+
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_VARIANTS_ASYNC=True
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for cache in caches.all():
+            cache.clear()
+
+    def test_variants_update_changes_recipe_versions(self):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов'
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), '#E26C2D').save(buffer, 'PNG')
+        recipe = Recipe(
+            author=author, name='Рецепт', text='Описание', cooking_time=10
+        )
+        recipe.image.save('test.png', ContentFile(buffer.getvalue()))
+        recipe.tags.add(tag)
+        names = [
+            RECIPES_VERSION, AUTHOR_RECIPES_VERSION.format(author.pk),
+            TAG_RECIPES_VERSION.format(tag.slug)
+        ]
+        versions = get_versions(names)
+        updated_at = recipe.updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            build_image_variants(recipe)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants_source, recipe.image.name)
+        self.assertGreater(recipe.updated_at, updated_at)
+        for name, old, new in zip(names, versions, get_versions(names)):
+            with self.subTest(name=name):
+                self.assertNotEqual(new, old)
+
+
+class MergeDuplicateIngredientsMigrationTests(TransactionTestCase):
+    migrate_from = [('recipes', '0009_engagement_counters')]
+    migrate_to = [('recipes', '0010_unique_ingredient')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.addCleanup(
+            self.migrate,
+            MigrationExecutor(connection).loader.graph.leaf_nodes()
+        )
+        apps = self.migrate(self.migrate_from)
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        author = apps.get_model('recipes', 'User').objects.create(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов'
+        )
+        salt, salt_copy, sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'соль', 'сахар')
+        )
+        self.soup, self.salad = (
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10,
+                image=IMAGE
+            )
+            for name in ('Суп', 'Салат')
+        )
+        for recipe, ingredient, amount in (
+            (self.soup, salt, 5), (self.soup, salt_copy, 3),
+            (self.soup, sugar, 7), (self.salad, salt_copy, 2),
+        ):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+
+    def test_duplicates_are_merged_per_recipe(self):
+        apps = self.migrate(self.migrate_to)
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        self.assertEqual(Ingredient.objects.filter(name='соль').count(), 1)
+        self.assertEqual(
+            sorted(RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name', 'amount'
+            )),
+            sorted([
+                (self.soup.pk, 'соль', 8), (self.soup.pk, 'сахар', 7),
+                (self.salad.pk, 'соль', 2),
+            ])
+        )
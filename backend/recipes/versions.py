@@ -0,0 +1,66 @@
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .replicas import read_from_primary
+
+VERSIONS_CACHE = 'versions'
+VERSION_CACHE_KEY = 'version:{}'
+RECIPES_VERSION = 'recipes'
+AUTHOR_RECIPES_VERSION = 'recipes:author:{}'
+TAG_RECIPES_VERSION = 'recipes:tag:{}'
+
+
+def new_version():
+    return f'{time():.6f}-{uuid4().hex}'
+
+
+def check_replica_lag(versions):
+    for version in versions:
+        try:
+            bumped_at = float(version.partition('-')[0])
+        except ValueError:
+            continue
+        if time() - bumped_at < settings.REPLICA_MAX_LAG:
+            read_from_primary()
+            return
+
+
+def get_version(name):
+    version = caches[VERSIONS_CACHE].get_or_set(
+        VERSION_CACHE_KEY.format(name), new_version, None
+    )
+    check_replica_lag([version])
+    return version
+
+
+def get_versions(names):
+    keys = [VERSION_CACHE_KEY.format(name) for name in names]
+    versions = caches[VERSIONS_CACHE].get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        caches[VERSIONS_CACHE].set_many(missing, None)
+        versions.update(missing)
+    check_replica_lag(versions.values())
+    return [versions[key] for key in keys]
+
+
+def bump_version(name):
+    caches[VERSIONS_CACHE].set(
+        VERSION_CACHE_KEY.format(name), new_version(), None
+    )
+
+
+def bump_recipe_versions(author_ids=(), tag_slugs=()):
+    names = [
+        RECIPES_VERSION,
+        *(AUTHOR_RECIPES_VERSION.format(pk) for pk in author_ids),
+        *(TAG_RECIPES_VERSION.format(slug) for slug in tag_slugs),
+    ]
+    transaction.on_commit(lambda: caches[VERSIONS_CACHE].set_many(
+        {VERSION_CACHE_KEY.format(name): new_version() for name in names},
+        None
+    ))